@@ -0,0 +1,42 @@
+"""version ktp_amount
+
+Revision ID: 3f1c2b7d9a10
+Revises: a78e435e386b
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2b7d9a10'
+down_revision: Union[str, Sequence[str], None] = 'a78e435e386b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('procurement_plan_versions') as batch_op:
+        batch_op.add_column(sa.Column('ktp_amount', sa.Numeric(20, 2), nullable=True))
+
+    # Заполняем счетчик КТП для уже существующих версий
+    op.execute("""
+        UPDATE procurement_plan_versions
+        SET ktp_amount = COALESCE((
+            SELECT SUM(i.total_amount)
+            FROM plan_item_versions i
+            WHERE i.version_id = procurement_plan_versions.id
+              AND i.is_ktp = true
+              AND i.is_deleted = false
+        ), 0)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('procurement_plan_versions') as batch_op:
+        batch_op.drop_column('ktp_amount')
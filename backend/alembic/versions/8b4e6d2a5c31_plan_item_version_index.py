@@ -0,0 +1,33 @@
+"""plan item version/is_deleted/item_number index
+
+Revision ID: 8b4e6d2a5c31
+Revises: 3f1c2b7d9a10
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b4e6d2a5c31'
+down_revision: Union[str, Sequence[str], None] = '3f1c2b7d9a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_plan_item_versions_version_deleted_number',
+        'plan_item_versions',
+        ['version_id', 'is_deleted', 'item_number'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_plan_item_versions_version_deleted_number', table_name='plan_item_versions')
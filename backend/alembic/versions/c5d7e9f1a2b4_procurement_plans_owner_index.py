@@ -0,0 +1,33 @@
+"""procurement plans created_by/id index
+
+Revision ID: c5d7e9f1a2b4
+Revises: 8b4e6d2a5c31
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d7e9f1a2b4'
+down_revision: Union[str, Sequence[str], None] = '8b4e6d2a5c31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_procurement_plans_created_by_id',
+        'procurement_plans',
+        ['created_by', 'id'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_procurement_plans_created_by_id', table_name='procurement_plans')
@@ -0,0 +1,28 @@
+"""reestr_ktp ens_tru_code index
+
+Revision ID: d2f4a6b8c0e1
+Revises: c5d7e9f1a2b4
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f4a6b8c0e1'
+down_revision: Union[str, Sequence[str], None] = 'c5d7e9f1a2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_reestr_ktp_ens_tru_code'), 'reestr_ktp', ['ens_tru_code'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_reestr_ktp_ens_tru_code'), table_name='reestr_ktp')
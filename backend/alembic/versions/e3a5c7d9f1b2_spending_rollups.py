@@ -0,0 +1,73 @@
+"""spending rollups
+
+Revision ID: e3a5c7d9f1b2
+Revises: d2f4a6b8c0e1
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a5c7d9f1b2'
+down_revision: Union[str, Sequence[str], None] = 'd2f4a6b8c0e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Тип needtype уже есть, если plan_item_versions создавалась через create_all
+    need_type = postgresql.ENUM('GOODS', 'WORKS', 'SERVICES', name='needtype', create_type=False)
+    need_type.create(op.get_bind(), checkfirst=True)
+
+    op.create_table(
+        'spending_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version_id', sa.Integer(), nullable=False),
+        sa.Column('plan_id', sa.Integer(), nullable=False),
+        sa.Column('year', sa.SmallInteger(), nullable=False),
+        sa.Column('expense_item_id', sa.Integer(), nullable=False),
+        sa.Column('funding_source_id', sa.Integer(), nullable=False),
+        sa.Column('need_type', sa.Enum('GOODS', 'WORKS', 'SERVICES', name='needtype').with_variant(need_type, 'postgresql'), nullable=False),
+        sa.Column('kato_delivery_id', sa.Integer(), nullable=True),
+        sa.Column('is_ktp', sa.Boolean(), nullable=False),
+        sa.Column('total_amount', sa.Numeric(20, 2), nullable=False),
+        sa.Column('item_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['version_id'], ['procurement_plan_versions.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['plan_id'], ['procurement_plans.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['expense_item_id'], ['cost_items.id']),
+        sa.ForeignKeyConstraint(['funding_source_id'], ['source_funding.id']),
+        sa.ForeignKeyConstraint(['kato_delivery_id'], ['kato.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_spending_rollups_version_id', 'spending_rollups', ['version_id'], unique=False)
+    op.create_index('ix_spending_rollups_year_plan_id', 'spending_rollups', ['year', 'plan_id'], unique=False)
+
+    # Заполняем сводку для уже существующих версий (как analytics_service.rebuild_version_rollup)
+    op.execute("""
+        INSERT INTO spending_rollups (
+            version_id, plan_id, year, expense_item_id, funding_source_id,
+            need_type, kato_delivery_id, is_ktp, total_amount, item_count
+        )
+        SELECT i.version_id, v.plan_id, p.year, i.expense_item_id, i.funding_source_id,
+               i.need_type, i.kato_delivery_id, COALESCE(i.is_ktp, false),
+               SUM(i.total_amount), COUNT(i.id)
+        FROM plan_item_versions i
+        JOIN procurement_plan_versions v ON v.id = i.version_id
+        JOIN procurement_plans p ON p.id = v.plan_id
+        WHERE i.is_deleted = false
+        GROUP BY i.version_id, v.plan_id, p.year, i.expense_item_id, i.funding_source_id,
+                 i.need_type, i.kato_delivery_id, COALESCE(i.is_ktp, false)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_spending_rollups_year_plan_id', table_name='spending_rollups')
+    op.drop_index('ix_spending_rollups_version_id', table_name='spending_rollups')
+    op.drop_table('spending_rollups')
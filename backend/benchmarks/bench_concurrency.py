@@ -0,0 +1,66 @@
+"""
+Нагрузочное сравнение синхронного и асинхронного стеков на запущенном сервере.
+
+    DB_MODE=sync  uvicorn main:app --port 8000
+    DB_MODE=async uvicorn main:app --port 8001
+    python -m benchmarks.bench_concurrency --url http://127.0.0.1:8000 --iin 111111111111
+    python -m benchmarks.bench_concurrency --url http://127.0.0.1:8001 --iin 111111111111
+
+Отправляет запросы дашборда (список планов, план, справочники) с заданной
+конкурентностью и печатает пропускную способность и перцентили задержки.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from src.utils.auth import create_access_token
+
+
+async def worker(client: httpx.AsyncClient, paths: list[str], count: int, latencies: list[float], errors: list[int]):
+    for i in range(count):
+        started = time.perf_counter()
+        response = await client.get(paths[i % len(paths)])
+        latencies.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            errors.append(response.status_code)
+
+
+async def run(url: str, token: str, plan_id: int | None, concurrency: int, requests: int):
+    paths = ["/api/plans/", "/api/lookups/mkei", "/api/lookups/enstru?q=сто", "/api/kato/"]
+    if plan_id is not None:
+        paths += [f"/api/plans/{plan_id}?view=compact", f"/api/plans/{plan_id}/versions"]
+
+    latencies: list[float] = []
+    errors: list[int] = []
+    limits = httpx.Limits(max_connections=concurrency)
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(base_url=url, headers=headers, limits=limits, timeout=60) as client:
+        per_worker = requests // concurrency
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client, paths, per_worker, latencies, errors) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+    print(f"{url}: {len(latencies)} запросов, конкурентность {concurrency}, ошибок {len(errors)}")
+    print(f"  {len(latencies) / elapsed:.0f} req/s, p50 {p(0.5):.1f} ms, p95 {p(0.95):.1f} ms, "
+          f"p99 {p(0.99):.1f} ms, среднее {statistics.mean(latencies) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--iin", required=True, help="ИИН пользователя, от имени которого идут запросы")
+    parser.add_argument("--plan-id", type=int)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    token = create_access_token({"sub": args.iin})
+    asyncio.run(run(args.url, token, args.plan_id, args.concurrency, args.requests))
+
+
+if __name__ == "__main__":
+    main()
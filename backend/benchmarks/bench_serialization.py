@@ -0,0 +1,68 @@
+"""
+Сравнение сериализации большого плана: стандартный путь FastAPI
+(валидация -> jsonable_encoder -> json.dumps) и PydanticJSONResponse.
+
+Запуск из каталога backend:  python -m benchmarks.bench_serialization [число позиций]
+"""
+import json
+import sys
+import timeit
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from fastapi.encoders import jsonable_encoder
+
+from src.schemas.plan import ProcurementPlanWithFullActiveVersion
+from src.utils.responses import PydanticJSONResponse
+
+
+def make_plan(items_count: int):
+    now = datetime(2026, 1, 1, 12, 0)
+    user = SimpleNamespace(id=1, iin="111111111111", full_name="Тестовый пользователь", org_name="Байтерек", bin=None)
+    items = [
+        SimpleNamespace(
+            id=i, version_id=1, item_number=i + 1, need_type="Товар",
+            trucode=f"{100000 + i}.{i % 7}", unit_id=1, expense_item_id=1, funding_source_id=2,
+            agsk_id=None, kato_purchase_id=3, kato_delivery_id=4,
+            quantity=Decimal("12.500"), price_per_unit=Decimal("1500.75"), total_amount=Decimal("18759.38"),
+            is_ktp=bool(i % 2), is_resident=True, is_deleted=False, created_at=now,
+            enstru=None, unit=None, expense_item=None, funding_source=None,
+            agsk=None, kato_purchase=None, kato_delivery=None,
+        )
+        for i in range(items_count)
+    ]
+    version = SimpleNamespace(
+        id=1, plan_id=1, version_number=1, status="DRAFT", total_amount=Decimal("1000000.00"),
+        ktp_amount=Decimal("500000.00"), ktp_percentage=Decimal("50.00"), import_percentage=Decimal("50.00"),
+        is_active=True, created_by=1, created_at=now, creator=user, items=items,
+    )
+    for item in items:
+        item.version = version
+    return SimpleNamespace(
+        id=1, plan_name="План", year=2026, created_at=now, created_by=1,
+        creator=user, active_version=version, versions=[version],
+    )
+
+
+def default_path(plan) -> bytes:
+    model = ProcurementPlanWithFullActiveVersion.model_validate(plan, from_attributes=True)
+    return json.dumps(jsonable_encoder(model), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def fast_path(plan) -> bytes:
+    return PydanticJSONResponse(ProcurementPlanWithFullActiveVersion, plan).body
+
+
+def main():
+    items_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    plan = make_plan(items_count)
+    assert json.loads(default_path(plan)) == json.loads(fast_path(plan))
+    for name, func in (("default", default_path), ("pydantic+json", fast_path)):
+        runs = 5
+        seconds = min(timeit.repeat(lambda: func(plan), number=1, repeat=runs))
+        print(f"{name:>14}: {seconds * 1000:8.1f} ms  ({len(func(plan)) / 1024:.0f} KB, {items_count} позиций)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from src.routers import auth, plans, items, lookups, kato_router
-from src.database.database import engine
+from src.routers import auth, plans, items, lookups, kato_router, admin, analytics
+from src.database import database
+from src.database.database import engine, SessionLocal, DB_MODE
 from src.database.base import Base
+from src.services import reference_cache
+from src.utils.responses import ORJSONResponse
+from src.utils.compression import JSONCompressionMiddleware
+from src.utils.read_your_writes import ReadYourWritesMiddleware
 
 # Создаём таблицы в БД (если их нет)
 Base.metadata.create_all(bind=engine)
@@ -22,16 +27,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# JSON больше 1 КБ сжимается (brotli/gzip по Accept-Encoding); Excel и Range-ответы не трогаются
+app.add_middleware(JSONCompressionMiddleware, minimum_size=1024)
+
+# Чтение идет в реплики (DATABASE_REPLICA_URLS); после записи клиент какое-то время читает из основной БД
+if database.DATABASE_REPLICA_URLS:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+# DB_MODE=async — те же эндпоинты на async def и AsyncSession
+if DB_MODE == "async":
+    from src.routers.aio import plans, items, lookups, kato_router, analytics
+
 # Подключение роутеров
-api_router = FastAPI()
+api_router = FastAPI(default_response_class=ORJSONResponse)
 api_router.include_router(auth.router)
 api_router.include_router(plans.router)
 api_router.include_router(items.router)
 api_router.include_router(lookups.router)
 api_router.include_router(kato_router.router, prefix="/kato", tags=["kato"])
+api_router.include_router(admin.router)
+api_router.include_router(analytics.router)
 
 app.mount("/api", api_router)
 
+@app.on_event("startup")
+def warm_reference_indexes():
+    # Загружаем справочники и строим индексы заранее, чтобы первые запросы не ждали
+    db = SessionLocal()
+    try:
+        reference_cache.reload_reference_data(db)
+    finally:
+        db.close()
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
+
 @app.get("/")
 def root():
     return {"message": "Байтерек API v2.1 работает!"}
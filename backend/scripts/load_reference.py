@@ -0,0 +1,47 @@
+"""
+Загрузка справочников из официальных XLSX/CSV-файлов.
+
+    python -m scripts.load_reference enstru ./enstru.xlsx
+    python -m scripts.load_reference reestr_ktp ./reestr_ktp.csv --chunk-size 10000
+    python -m scripts.load_reference reestr_ktp ./reestr_ktp.csv --delta
+
+Первая строка файла — имена столбцов таблицы (code, name_ru, ...). Загрузка
+идет в одной транзакции на таблицу; в конце печатается отчет.
+С --delta файл сравнивается с таблицей и записываются только отличия.
+Справочники и индексы в памяти (индекс ЕНС ТРУ, дерево KATO, коды реестра КТП)
+запущенные воркеры API перестроят сами не позже чем через REFERENCE_CACHE_TTL.
+POST /api/admin/reference/reload перестраивает их сразу, но только в том
+воркере, который принял запрос.
+"""
+import argparse
+import json
+import sys
+
+from fastapi import HTTPException
+
+from src.database.database import SessionLocal
+from src.services import reference_loader
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Загрузка справочника из XLSX/CSV")
+    parser.add_argument("table", choices=sorted(reference_loader.REFERENCE_SPECS))
+    parser.add_argument("path")
+    parser.add_argument("--chunk-size", type=int, default=reference_loader.REFERENCE_LOAD_CHUNK_SIZE)
+    parser.add_argument("--delta", action="store_true", help="применить только вставки, изменения и удаления")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as file:
+            report = reference_loader.load_reference_file(db, args.table, file, args.path, chunk_size=args.chunk_size, delta=args.delta)
+    except HTTPException as e:
+        sys.exit(f"Ошибка: {e.detail}")
+    finally:
+        db.close()
+
+    print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,124 @@
 # src/database/database.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from pydantic_settings import BaseSettings
+import itertools
 import os
+
 from dotenv import load_dotenv
+from fastapi import Request
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from . import sqlite
 
 # Загружаем .env
 load_dotenv()
 
 # Больше НЕ используем Settings() для DATABASE_URL — читаем напрямую!
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./baiterek.db")
+# Реплики только для чтения (через запятую); пусто — все читается из основной БД
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+# Настройки пула соединений (для каждого движка отдельно)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Через сколько секунд соединение пересоздается (-1 — никогда)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
 
-# Для SQLite — обязательно!
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+# Сколько секунд после изменения данных клиент читает из основной БД (read-your-writes)
+DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", "10"))
+PRIMARY_STICKY_COOKIE = "db_read_primary"
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args=connect_args,
-    echo=False
+# Рабочий режим SQLite: WAL, один писатель и пул читателей (см. database/sqlite.py)
+SQLITE_WAL = (
+    DATABASE_URL.startswith("sqlite")
+    and ":memory:" not in DATABASE_URL
+    and os.getenv("SQLITE_WAL", "false").lower() in ("1", "true", "yes")
 )
 
+
+def _engine_options(url: str, single_writer: bool = False) -> dict:
+    options = {"echo": False, "pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    if url.startswith("sqlite"):
+        # Для SQLite — обязательно!
+        options["connect_args"] = {"check_same_thread": False}
+    if single_writer:
+        # Одно соединение: пишущие сессии ждут своей очереди в пуле
+        if "aiosqlite" in url:
+            from sqlalchemy.pool import AsyncAdaptedQueuePool
+            options["poolclass"] = AsyncAdaptedQueuePool
+        options.update(pool_size=1, max_overflow=0, pool_timeout=DB_POOL_TIMEOUT)
+    # aiosqlite и SQLite в памяти работают без очереди соединений
+    elif "aiosqlite" not in url and ":memory:" not in url:
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+
+def _create_engines(create, to_url=lambda url: url) -> tuple:
+    """Основной движок и движки для чтения: реплики или, в режиме SQLITE_WAL, пул только для чтения."""
+    url = to_url(DATABASE_URL)
+    primary = create(url, **_engine_options(url, single_writer=SQLITE_WAL))
+    read_urls = [to_url(replica_url) for replica_url in DATABASE_REPLICA_URLS]
+    if SQLITE_WAL:
+        sqlite.configure_engine(getattr(primary, "sync_engine", primary), writer=True)
+        if not read_urls:
+            read_urls = [sqlite.read_only_url(url)]
+    readers = [create(read_url, **_engine_options(read_url)) for read_url in read_urls]
+    if SQLITE_WAL:
+        for reader in readers:
+            if reader.url.get_backend_name() == "sqlite":
+                sqlite.configure_engine(getattr(reader, "sync_engine", reader), writer=False)
+    return primary, readers
+
+
+engine, replica_engines = _create_engines(create_engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReplicaSessions = [sessionmaker(autocommit=False, autoflush=False, bind=e) for e in replica_engines]
+# Долгие фоновые чтения (выгрузки): в режиме SQLITE_WAL не должны занимать единственное соединение писателя
+ReadOnlySessionLocal = ReplicaSessions[0] if SQLITE_WAL and not DATABASE_REPLICA_URLS else SessionLocal
+
+# sync — обработчики def в пуле потоков; async — async def на AsyncSession
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+
+
+def _async_url(url: str) -> str:
+    """Асинхронный драйвер для того же URL: aiosqlite для SQLite, asyncpg для PostgreSQL."""
+    scheme, rest = url.split(":", 1)
+    if scheme.startswith("sqlite"):
+        return "sqlite+aiosqlite:" + rest
+    if scheme.startswith("postgres"):
+        return "postgresql+asyncpg:" + rest
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_url(DATABASE_URL))
+
+async_engine = None
+AsyncSessionLocal = None
+async_replica_engines = []
+AsyncReplicaSessions = []
+if DB_MODE == "async":
+    # Импорт здесь, чтобы в синхронном режиме не требовались aiosqlite/asyncpg
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine, async_replica_engines = _create_engines(
+        create_async_engine, lambda url: ASYNC_DATABASE_URL if url == DATABASE_URL else _async_url(url)
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+    AsyncReplicaSessions = [async_sessionmaker(e, autoflush=False) for e in async_replica_engines]
+
+_replica_counter = itertools.count()
+
+
+def _read_session_factory(request: Request, primary, replicas):
+    """
+    Реплика по кругу, если они настроены и клиент недавно ничего не менял
+    (иначе он мог бы не увидеть собственную запись из-за отставания реплики).
+    """
+    if not replicas or PRIMARY_STICKY_COOKIE in request.cookies:
+        return primary
+    return replicas[next(_replica_counter) % len(replicas)]
 
 
 def get_db():
@@ -28,4 +126,23 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_read_db(request: Request):
+    """Сессия для эндпоинтов, которые только читают данные."""
+    db = _read_session_factory(request, SessionLocal, ReplicaSessions)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db(request: Request):
+    async with _read_session_factory(request, AsyncSessionLocal, AsyncReplicaSessions)() as db:
+        yield db
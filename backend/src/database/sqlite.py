@@ -0,0 +1,57 @@
+# src/database/sqlite.py
+"""
+Режим SQLite для небольших инсталляций без PostgreSQL (SQLITE_WAL=true).
+
+Запись идет через единственное соединение: очередь пула сериализует пишущие
+сессии внутри процесса, а BEGIN IMMEDIATE берет блокировку на запись сразу,
+поэтому параллельные воркеры ждут busy_timeout вместо "database is locked".
+Чтение — через отдельный пул соединений только для чтения; в WAL читатели
+не блокируются писателем и видят последние закоммиченные данные.
+"""
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+def read_only_url(url: str) -> str:
+    """URL того же файла, открытого в режиме только для чтения."""
+    prefix, path = url.split(":///", 1)
+    return f"{prefix}:///file:{path}?mode=ro&uri=true"
+
+
+def _apply_pragmas(dbapi_connection, writer: bool):
+    cursor = dbapi_connection.cursor()
+    if writer:
+        # WAL хранится в самом файле БД, поэтому включается один раз писателем
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # В WAL при NORMAL коммит не делает fsync (только контрольная точка):
+        # надежность при сбое питания — до последних коммитов, но не порча файла
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def configure_engine(engine: Engine, writer: bool) -> Engine:
+    """Навешивает PRAGMA на каждое новое соединение; писателю — BEGIN IMMEDIATE."""
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        _apply_pragmas(dbapi_connection, writer)
+        if writer:
+            # Транзакциями управляет SQLAlchemy (см. on_begin), а не драйвер
+            dbapi_connection.isolation_level = None
+
+    if writer:
+        @event.listens_for(engine, "begin")
+        def on_begin(connection):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
@@ -1,6 +1,6 @@
 from sqlalchemy import (
     Column, Integer, String, Text, Boolean, DateTime, Date,
-    ForeignKey, Numeric, SmallInteger, UniqueConstraint, Enum, and_
+    ForeignKey, Numeric, SmallInteger, UniqueConstraint, Enum, Index, and_
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -50,6 +50,14 @@ class ProcurementPlan(Base):
         order_by="ProcurementPlanVersion.version_number"
     )
 
+    __table_args__ = (
+        Index("ix_procurement_plans_created_by_id", "created_by", "id"),
+    )
+
+    @property
+    def active_version(self):
+        return next((v for v in self.versions if v.is_active), None)
+
 class ProcurementPlanVersion(Base):
     __tablename__ = "procurement_plan_versions"
 
@@ -60,6 +68,7 @@ class ProcurementPlanVersion(Base):
     status = Column(Enum(PlanStatus), nullable=False)
 
     total_amount = Column(Numeric(20, 2), default=0)
+    ktp_amount = Column(Numeric(20, 2), default=0)
     ktp_percentage = Column(Numeric(5, 2))
     import_percentage = Column(Numeric(5, 2))
 
@@ -125,9 +134,37 @@ class PlanItemVersion(Base):
 
     __table_args__ = (
         UniqueConstraint("version_id", "item_number", name="uq_version_item"),
+        Index("ix_plan_item_versions_version_deleted_number", "version_id", "is_deleted", "item_number"),
     )
 
 
+class SpendingRollup(Base):
+    """
+    Суммы неудаленных позиций версии в разрезе измерений аналитики.
+    Ведется инкрементально при изменении позиций (services/analytics_service.py).
+    """
+    __tablename__ = "spending_rollups"
+
+    id = Column(Integer, primary_key=True)
+    version_id = Column(Integer, ForeignKey("procurement_plan_versions.id", ondelete="CASCADE"), nullable=False)
+    # Копии полей плана (они не меняются), чтобы отчеты по году не соединялись с планами
+    plan_id = Column(Integer, ForeignKey("procurement_plans.id", ondelete="CASCADE"), nullable=False)
+    year = Column(SmallInteger, nullable=False)
+
+    expense_item_id = Column(Integer, ForeignKey("cost_items.id"), nullable=False)
+    funding_source_id = Column(Integer, ForeignKey("source_funding.id"), nullable=False)
+    need_type = Column(Enum(NeedType), nullable=False)
+    kato_delivery_id = Column(Integer, ForeignKey("kato.id"))
+    is_ktp = Column(Boolean, nullable=False)
+
+    total_amount = Column(Numeric(20, 2), nullable=False, default=0)
+    item_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_spending_rollups_version_id", "version_id"),
+        Index("ix_spending_rollups_year_plan_id", "year", "plan_id"),
+    )
+
 class Mkei(Base):
     __tablename__ = "mkei"
     id = Column(Integer, primary_key=True)
@@ -189,7 +226,7 @@ class Reestr_KTP(Base):
     unit_per_year = Column(String(20),nullable=False)
     tn_ved = Column(String(10),nullable=True)
     kpved = Column(String(20),nullable=True)
-    ens_tru_code = Column(String(35), nullable=False)
+    ens_tru_code = Column(String(35), nullable=False, index=True)
     agsk_code = Column(String(50), nullable=True)
     level_localization = Column(Integer)
     date_add_reestr = Column(Date)
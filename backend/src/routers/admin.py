@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, File, Query, UploadFile
+from sqlalchemy.orm import Session
+
+from ..database.database import get_db
+from ..schemas import user as user_schema
+from ..services import analytics_service, reference_cache, reference_loader, user_service
+from ..utils.auth import require_admin
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Administration"],
+    dependencies=[Depends(require_admin)]
+)
+
+@router.post("/reference/reload")
+def reload_reference_data(db: Session = Depends(get_db)):
+    """
+    Перечитать справочники и перестроить индексы в памяти этого воркера
+    (остальные перестроят их сами через REFERENCE_CACHE_TTL).
+    Возвращает новые версии справочников (они же входят в ETag ответов).
+    """
+    versions = reference_cache.reload_reference_data(db)
+    return {"versions": versions}
+
+@router.post("/reference/{table_name}/load")
+def load_reference_table(
+    table_name: str,
+    file: UploadFile = File(...),
+    delta: bool = Query(False, description="Файл — полный снимок: применить только вставки, изменения и удаления"),
+    db: Session = Depends(get_db)
+):
+    """
+    Загрузить справочник из XLSX/CSV (первая строка — имена столбцов таблицы).
+    enstru, kato, agsk, mkei, cost_items, source_funding обновляются по ключу (upsert),
+    reestr_ktp заменяется целиком. С delta=true сравнивается по естественному ключу
+    и меняются только отличающиеся строки. Возвращает отчет о загрузке со скоростью.
+    """
+    return reference_loader.load_reference_file(db, table_name, file.file, file.filename or "", delta=delta)
+
+@router.post("/analytics/rebuild")
+def rebuild_spending_rollups(db: Session = Depends(get_db)):
+    """
+    Пересобрать сводную таблицу аналитики по всем позициям.
+    Обычно она ведется инкрементально; эндпоинт нужен после ручных правок данных.
+    """
+    analytics_service.rebuild_version_rollup(db)
+    db.commit()
+    return {"ok": True}
+
+@router.post("/users/{user_id}/deactivate", response_model=user_schema.User)
+def deactivate_user(user_id: int, db: Session = Depends(get_db)):
+    """
+    Деактивировать пользователя. Запись в кэше авторизации сбрасывается,
+    поэтому следующий же запрос с его токеном получит 403.
+    """
+    return user_service.set_user_active(db, user_id, is_active=False)
+
+@router.post("/users/{user_id}/activate", response_model=user_schema.User)
+def activate_user(user_id: int, db: Session = Depends(get_db)):
+    """
+    Снова активировать пользователя.
+    """
+    return user_service.set_user_active(db, user_id, is_active=True)
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...database.database import get_async_db, get_async_read_db
+from ...schemas import plan as plan_schema
+from ...services.aio import item_service
+from ...utils.auth import get_current_user_async
+from ...models import models
+
+router = APIRouter(
+    prefix="/items",
+    tags=["Plan Items"],
+    dependencies=[Depends(get_current_user_async)]
+)
+
+@router.get("/{item_id}", response_model=plan_schema.PlanItem)
+async def read_plan_item(
+    item_id: int,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """Получить конкретную позицию сметы по ID вместе с информацией о ее версии."""
+    return await item_service.get_item_for_user(db, item_id=item_id, user=current_user)
+
+@router.put("/{item_id}", response_model=plan_schema.PlanItem)
+async def update_plan_item(
+    item_id: int,
+    item_in: plan_schema.PlanItemUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """
+    Обновить позицию сметы.
+    Редактирование возможно только для версий в статусе DRAFT.
+    """
+    return await item_service.update_item(db, item_id=item_id, item_in=item_in, user=current_user)
+
+
+@router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_plan_item(
+    item_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """
+    Удалить позицию сметы.
+    Удаление возможно только для версий в статусе DRAFT.
+    """
+    await item_service.delete_item(db, item_id=item_id, user=current_user)
+    return {"ok": True}
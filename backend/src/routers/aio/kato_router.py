@@ -0,0 +1,30 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...database.database import get_async_read_db
+from ...services.aio import kato_service
+from ...schemas.kato_schema import KatoSchema, KatoPathSchema
+
+router = APIRouter()
+
+@router.get("/", response_model=List[KatoSchema])
+async def read_kato_children(parent_id: int | None = 0, db: AsyncSession = Depends(get_async_read_db)):
+    kato_items = await kato_service.get_kato_children(db, parent_id=parent_id)
+    return [KatoSchema(**kato) for kato in kato_items]
+
+@router.get("/paths", response_model=List[KatoPathSchema])
+async def read_kato_paths(ids: List[int] = Query(..., max_length=1000), db: AsyncSession = Depends(get_async_read_db)):
+    """Пути от корня для нескольких KATO сразу (для таблиц позиций сметы)."""
+    return await kato_service.get_kato_paths(db, ids)
+
+@router.get("/{kato_id}", response_model=KatoSchema)
+async def read_kato_by_id(kato_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    kato = await kato_service.get_kato_by_id(db, kato_id)
+    if kato is None:
+        raise HTTPException(status_code=404, detail="Kato not found")
+    return KatoSchema(**kato)
+
+@router.get("/{kato_id}/parents", response_model=List[KatoSchema])
+async def read_kato_parents(kato_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    parents = await kato_service.get_kato_parents(db, kato_id)
+    return [KatoSchema(**parent) for parent in parents]
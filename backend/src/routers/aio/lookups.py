@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from ...database.database import get_async_read_db
+from ...schemas import lookup as lookup_schema
+from ...services import reference_cache
+from ...services.aio import lookup_service
+from ..lookups import cached_lookup
+
+router = APIRouter(
+    prefix="/lookups",
+    tags=["Lookups"],
+)
+
+@router.get("/check-ktp/{enstru_code}")
+async def check_ktp_by_enstru(enstru_code: str, db: AsyncSession = Depends(get_async_read_db)):
+    """Проверяет, есть ли код ЕНС ТРУ в реестре КТП."""
+    return {"is_ktp": await lookup_service.is_ktp(db, enstru_code)}
+
+@router.post("/check-ktp", response_model=lookup_schema.KtpCheckResult)
+async def check_ktp_batch(check_in: lookup_schema.KtpCheckRequest, db: AsyncSession = Depends(get_async_read_db)):
+    """Пакетная проверка: статус в реестре КТП для каждого кода ЕНС ТРУ из списка."""
+    return {"results": await lookup_service.check_ktp_codes(db, check_in.codes)}
+
+@router.get("/mkei", response_model=List[lookup_schema.Mkei])
+async def get_mkei_list(request: Request, response: Response, q: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db)):
+    table = await lookup_service.get_reference_table(db, reference_cache.mkei_cache)
+    return cached_lookup(table, q, request, response)
+
+@router.get("/kato", response_model=List[lookup_schema.Kato])
+async def get_kato_list(q: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db)):
+    return await lookup_service.search_kato(db, q)
+
+@router.get("/agsk", response_model=List[lookup_schema.Agsk])
+async def get_agsk_list(q: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db)):
+    return await lookup_service.search_agsk(db, q)
+
+@router.get("/cost-items", response_model=List[lookup_schema.CostItem])
+async def get_cost_item_list(request: Request, response: Response, q: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db)):
+    table = await lookup_service.get_reference_table(db, reference_cache.cost_item_cache)
+    return cached_lookup(table, q, request, response)
+
+@router.get("/source-funding", response_model=List[lookup_schema.SourceFunding])
+async def get_source_funding_list(request: Request, response: Response, q: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db)):
+    table = await lookup_service.get_reference_table(db, reference_cache.source_funding_cache)
+    return cached_lookup(table, q, request, response)
+
+@router.get("/enstru", response_model=List[lookup_schema.Enstru])
+async def get_enstru_list(q: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db)):
+    """Поиск по ЕНС ТРУ через индекс в памяти (см. services/enstru_search.py)."""
+    return await lookup_service.search_enstru(db, q)
@@ -0,0 +1,286 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional, Union
+from ...database.database import get_async_db, get_async_read_db
+from ...schemas import plan as plan_schema
+from ...services import export_cache, plan_service as sync_plan_service
+from ...services.aio import plan_service
+from ...utils.auth import get_current_user_async
+from ...models import models
+from ...utils.file_response import cached_file_response
+from ...utils.responses import PydanticJSONResponse
+from ..plans import response_view
+
+router = APIRouter(
+    prefix="/plans",
+    tags=["Procurement Plans & Versions"],
+    dependencies=[Depends(get_current_user_async)]
+)
+
+async def verify_plan_owner(
+    plan_id: int,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.User = Depends(get_current_user_async)
+) -> int:
+    """
+    Проверяет, что план существует и принадлежит текущему пользователю.
+    Не загружает план целиком — только ID владельца. Читает через сессию чтения:
+    владелец плана не меняется, а своя новая запись видна благодаря sticky-cookie.
+    """
+    owner_id = await plan_service.get_plan_owner_id(db, plan_id)
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail="План не найден")
+    if owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Нет прав для доступа к этому плану")
+    return plan_id
+
+# ========= Эндпоинты для Планов (ProcurementPlan) =========
+
+@router.post("/", response_model=plan_schema.ProcurementPlan, status_code=status.HTTP_201_CREATED)
+async def create_procurement_plan(
+    plan_in: plan_schema.ProcurementPlanCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """
+    Создать новый план закупок.
+    Автоматически создается первая версия (v1) со статусом DRAFT.
+    """
+    return await plan_service.create_plan(db, plan_in=plan_in, user=current_user)
+
+@router.get("/", response_model=plan_schema.ProcurementPlanSummaryPage)
+async def read_user_procurement_plans(
+    year: Optional[int] = None,
+    plan_status: Optional[models.PlanStatus] = Query(None, alias="status"),
+    cursor: Optional[int] = None,
+    limit: int = Query(sync_plan_service.PLAN_PAGE_LIMIT, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """
+    Получить список планов текущего пользователя (сводка по активной версии).
+    Следующая страница запрашивается с cursor=next_cursor.
+    """
+    return await plan_service.get_plan_summaries(
+        db, user=current_user, year=year, plan_status=plan_status, cursor=cursor, limit=limit
+    )
+
+@router.get(
+    "/{plan_id}",
+    response_model=Union[plan_schema.ProcurementPlanWithFullActiveVersion, plan_schema.ProcurementPlanCompact],
+    dependencies=[Depends(verify_plan_owner)]
+)
+async def read_procurement_plan_with_active_version(
+    plan_id: int,
+    view: str = Depends(response_view),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Получить конкретный план по ID с его активной версией и всеми ее позициями.
+    Остальные версии возвращаются без позиций.
+    """
+    if view == "full":
+        plan = await plan_service.get_plan_with_active_version(db, plan_id=plan_id)
+        return PydanticJSONResponse(plan_schema.ProcurementPlanWithFullActiveVersion, plan)
+    plan = await plan_service.get_plan_compact(db, plan_id=plan_id)
+    return PydanticJSONResponse(plan_schema.ProcurementPlanCompact, plan)
+
+@router.delete("/{plan_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(verify_plan_owner)])
+async def delete_procurement_plan(
+    plan_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Удалить план закупок.
+    Удаление возможно, только если план никогда не был одобрен.
+    """
+    await plan_service.delete_plan(db, plan_id=plan_id)
+    return {"ok": True}
+
+
+# ========= Эндпоинты для Версий Плана (ProcurementPlanVersion) =========
+
+@router.get("/{plan_id}/versions", response_model=List[plan_schema.ProcurementPlanVersion], dependencies=[Depends(verify_plan_owner)])
+async def read_plan_versions(plan_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    """
+    История версий плана (без позиций).
+    """
+    return await plan_service.get_plan_versions(db, plan_id)
+
+@router.post("/{plan_id}/versions", response_model=plan_schema.ProcurementPlanVersion, dependencies=[Depends(verify_plan_owner)])
+async def create_new_version(
+    plan_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """
+    Создать новую версию (v+1) для редактирования из последней одобренной.
+    Старая версия становится неактивной, новая - активной со статусом DRAFT.
+    """
+    return await plan_service.create_new_version_for_editing(db, plan_id=plan_id, user=current_user)
+
+@router.patch("/{plan_id}/versions/active/status", response_model=plan_schema.ProcurementPlanVersion, dependencies=[Depends(verify_plan_owner)])
+async def update_active_version_status(
+    plan_id: int,
+    status_in: plan_schema.ProcurementPlanStatusUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """
+    Обновить статус активной версии плана (DRAFT -> PRE_APPROVED -> APPROVED).
+    """
+    return await plan_service.update_plan_status(db, plan_id=plan_id, new_status=status_in.status, user=current_user)
+
+
+@router.delete("/{plan_id}/versions/latest", status_code=status.HTTP_200_OK, dependencies=[Depends(verify_plan_owner)])
+async def delete_latest_plan_version(
+    plan_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """
+    Удалить последнюю версию, если она в статусе DRAFT.
+    Предыдущая версия автоматически становится активной.
+    """
+    return await plan_service.delete_latest_version(db, plan_id=plan_id, user=current_user)
+
+
+@router.get(
+    "/{plan_id}/versions/{version_id}/items",
+    response_model=Union[plan_schema.PlanItemPage, plan_schema.PlanItemPageCompact],
+    dependencies=[Depends(verify_plan_owner)]
+)
+async def read_version_items(
+    plan_id: int,
+    version_id: int,
+    filters: plan_schema.PlanItemFilter = Depends(),
+    sort: Literal["item_number", "total_amount", "price_per_unit", "quantity", "trucode"] = "item_number",
+    order: Literal["asc", "desc"] = "asc",
+    cursor: Optional[str] = Query(None, description="next_cursor из предыдущей страницы"),
+    limit: int = Query(100, ge=1, le=1000),
+    view: str = Depends(response_view),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Получить позиции любой версии плана постранично, с фильтрами и сортировкой.
+    По умолчанию удаленные позиции не возвращаются.
+    """
+    page = await plan_service.get_version_items_page(
+        db, plan_id=plan_id, version_id=version_id, view=view,
+        filters=filters, sort=sort, order=order, cursor=cursor, limit=limit
+    )
+    schema = plan_schema.PlanItemPage if view == "full" else plan_schema.PlanItemPageCompact
+    return PydanticJSONResponse(schema, page)
+
+
+@router.get("/{plan_id}/versions/{version_id}/ktp-check", response_model=List[plan_schema.PlanItemKtpStatus], dependencies=[Depends(verify_plan_owner)])
+async def check_version_ktp(
+    plan_id: int,
+    version_id: int,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Проверить все позиции версии по реестру КТП одним запросом.
+    in_registry — код ЕНС ТРУ есть в реестре, is_ktp — признак, сохраненный в позиции.
+    """
+    return await plan_service.get_version_ktp_status(db, plan_id=plan_id, version_id=version_id)
+
+
+@router.get("/{plan_id}/versions/{from_version_id}/diff/{to_version_id}", response_model=plan_schema.PlanVersionDiff, dependencies=[Depends(verify_plan_owner)])
+async def diff_versions(
+    plan_id: int,
+    from_version_id: int,
+    to_version_id: int,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Сравнить две версии плана: добавленные, удаленные и измененные позиции
+    (по item_number) с дельтами полей, а также дельты итогов и процентов КТП.
+    """
+    diff = await plan_service.get_versions_diff(db, plan_id=plan_id, from_version_id=from_version_id, to_version_id=to_version_id)
+    return PydanticJSONResponse(plan_schema.PlanVersionDiff, diff)
+
+
+@router.post("/{plan_id}/versions/{version_id}/recalculate", response_model=plan_schema.ProcurementPlanVersion, dependencies=[Depends(verify_plan_owner)])
+async def recalculate_version_metrics(
+    plan_id: int,
+    version_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Полностью пересчитать суммы и проценты КТП версии по ее позициям.
+    Обычно метрики обновляются инкрементально; эндпоинт нужен для проверки согласованности.
+    """
+    return await plan_service.recalculate_version(db, plan_id=plan_id, version_id=version_id)
+
+
+@router.get("/{plan_id}/versions/{version_id}/export-excel", dependencies=[Depends(verify_plan_owner)])
+async def export_version_to_excel(
+    plan_id: int,
+    version_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Экспортировать конкретную версию сметы в Excel.
+    Сборка файла и чтение строк остаются синхронными и выполняются в пуле потоков.
+    """
+    version = await plan_service.get_export_version(db, plan_id, version_id)
+    media_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    filename = f"plan_{plan_id}_v{version_id}.xlsx"
+
+    if version.status == models.PlanStatus.APPROVED:
+        path, etag = await run_in_threadpool(
+            export_cache.get_approved_export, plan_id, version.id, version.version_number
+        )
+        return cached_file_response(request, path, etag, media_type, filename)
+
+    return StreamingResponse(
+        sync_plan_service.stream_plan_to_excel(plan_id, version.id, version.version_number),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+# ========= Эндпоинты для Позиций (PlanItem) в контексте Плана =========
+
+@router.post("/{plan_id}/items", response_model=plan_schema.PlanItem, status_code=status.HTTP_201_CREATED, dependencies=[Depends(verify_plan_owner)])
+async def create_plan_item_for_active_version(
+    plan_id: int,
+    item_in: plan_schema.PlanItemCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """
+    Добавить новую позицию в активную версию сметы.
+    """
+    return await plan_service.add_item_to_plan(db, plan_id=plan_id, item_in=item_in, user=current_user)
+
+@router.post("/{plan_id}/items:bulk", response_model=plan_schema.PlanItemBulkResult, status_code=status.HTTP_201_CREATED, dependencies=[Depends(verify_plan_owner)])
+async def create_plan_items_bulk(
+    plan_id: int,
+    bulk_in: plan_schema.PlanItemBulkCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """
+    Добавить сразу много позиций в активную версию сметы одной транзакцией.
+    Если хотя бы одна ссылка на справочник не найдена, ничего не добавляется.
+    """
+    return await plan_service.add_items_to_plan_bulk(db, plan_id=plan_id, items_in=bulk_in.items, user=current_user)
+
+@router.post("/{plan_id}/items:import", response_model=plan_schema.PlanItemImportResult, dependencies=[Depends(verify_plan_owner)])
+async def import_plan_items(
+    plan_id: int,
+    file: UploadFile = File(..., description="XLSX в формате выгрузки export-excel (или CSV с теми же заголовками)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """
+    Импортировать позиции в активную версию (черновик) из Excel.
+    Корректные строки добавляются одной транзакцией, по остальным возвращается отчет с номерами строк.
+    """
+    # Разбор файла не обращается к БД и нагружает CPU — выполняем его в пуле потоков
+    items, errors = await run_in_threadpool(sync_plan_service.parse_items_file, file.file, file.filename or "")
+    return await plan_service.import_items_to_plan(db, plan_id=plan_id, items=items, errors=errors, user=current_user)
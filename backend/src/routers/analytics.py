@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from ..database.database import get_read_db
+from ..schemas import analytics as analytics_schema
+from ..services import analytics_service
+from ..utils.auth import get_current_user, is_admin
+from ..models import models
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["Analytics"],
+    dependencies=[Depends(get_current_user)]
+)
+
+@router.get("/spending", response_model=analytics_schema.SpendingReport)
+def read_spending_totals(
+    group_by: List[analytics_schema.SpendingDimension] = Query(["expense_item_id"]),
+    scope: analytics_schema.SpendingScope = "approved",
+    year: Optional[int] = None,
+    plan_id: Optional[int] = None,
+    org_bin: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Суммы закупок в разрезе статей затрат, источников финансирования, вида закупки,
+    KATO поставки и КТП/импорта — по плану, году и организации (БИН).
+    scope=approved — последние одобренные версии планов, active — текущие версии.
+    Администраторы видят все планы, остальные пользователи — только свои.
+    """
+    return analytics_service.get_spending_totals(
+        db, group_by=group_by, scope=scope, year=year, plan_id=plan_id, org_bin=org_bin,
+        owner_id=None if is_admin(current_user) else current_user.id
+    )
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from ..database.database import get_db
+from ..database.database import get_db, get_read_db
 from ..schemas import plan as plan_schema
 from ..services import item_service
 from ..utils.auth import get_current_user
@@ -15,7 +15,7 @@ router = APIRouter(
 @router.get("/{item_id}", response_model=plan_schema.PlanItem)
 def read_plan_item(
     item_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Получить конкретную позицию сметы по ID вместе с информацией о ее версии."""
@@ -1,33 +1,51 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from typing import List, Optional
 
-from ..database.database import get_db
+from ..database.database import get_read_db
 from ..schemas import lookup as lookup_schema
 from ..models import models
+from ..services import enstru_search, ktp_registry, reference_cache
 
 router = APIRouter(
     prefix="/lookups",
     tags=["Lookups"],
 )
 
+def cached_lookup(
+    table: reference_cache.ReferenceSnapshot,
+    q: Optional[str],
+    request: Request,
+    response: Response,
+):
+    """Фильтрует загруженный справочник в памяти и проставляет ETag/Cache-Control."""
+    etag = table.etag(q)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={reference_cache.REFERENCE_HTTP_MAX_AGE}",
+    }
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return table.search(q)
+
 @router.get("/check-ktp/{enstru_code}")
-def check_ktp_by_enstru(enstru_code: str, db: Session = Depends(get_db)):
+def check_ktp_by_enstru(enstru_code: str, db: Session = Depends(get_read_db)):
     """Проверяет, есть ли код ЕНС ТРУ в реестре КТП."""
-    exists = db.query(models.Reestr_KTP).filter(models.Reestr_KTP.ens_tru_code == enstru_code).first()
-    return {"is_ktp": exists is not None}
+    return {"is_ktp": ktp_registry.is_ktp(db, enstru_code)}
+
+@router.post("/check-ktp", response_model=lookup_schema.KtpCheckResult)
+def check_ktp_batch(check_in: lookup_schema.KtpCheckRequest, db: Session = Depends(get_read_db)):
+    """Пакетная проверка: статус в реестре КТП для каждого кода ЕНС ТРУ из списка."""
+    return {"results": ktp_registry.check_codes(db, check_in.codes)}
 
 @router.get("/mkei", response_model=List[lookup_schema.Mkei])
-def get_mkei_list(q: Optional[str] = None, db: Session = Depends(get_db)):
-    query = db.query(models.Mkei)
-    if q:
-        search_term = f"%{q}%"
-        query = query.filter(or_(models.Mkei.code.ilike(search_term), models.Mkei.name_ru.ilike(search_term)))
-    return query.limit(50).all()
+def get_mkei_list(request: Request, response: Response, q: Optional[str] = None, db: Session = Depends(get_read_db)):
+    return cached_lookup(reference_cache.mkei_cache.get(db), q, request, response)
 
 @router.get("/kato", response_model=List[lookup_schema.Kato])
-def get_kato_list(q: Optional[str] = None, db: Session = Depends(get_db)):
+def get_kato_list(q: Optional[str] = None, db: Session = Depends(get_read_db)):
     query = db.query(models.Kato)
     if q:
         search_term = f"%{q}%"
@@ -35,7 +53,7 @@ def get_kato_list(q: Optional[str] = None, db: Session = Depends(get_db)):
     return query.limit(50).all()
 
 @router.get("/agsk", response_model=List[lookup_schema.Agsk])
-def get_agsk_list(q: Optional[str] = None, db: Session = Depends(get_db)):
+def get_agsk_list(q: Optional[str] = None, db: Session = Depends(get_read_db)):
     query = db.query(models.Agsk)
     if q:
         search_term = f"%{q}%"
@@ -45,32 +63,14 @@ def get_agsk_list(q: Optional[str] = None, db: Session = Depends(get_db)):
     return query.limit(50).all()
 
 @router.get("/cost-items", response_model=List[lookup_schema.CostItem])
-def get_cost_item_list(q: Optional[str] = None, db: Session = Depends(get_db)):
-    query = db.query(models.Cost_Item)
-    if q:
-        search_term = f"%{q}%"
-        query = query.filter(or_(models.Cost_Item.name_ru.ilike(search_term),
-                                 models.Cost_Item.name_kz.ilike(search_term)))
-    return query.limit(50).all()
+def get_cost_item_list(request: Request, response: Response, q: Optional[str] = None, db: Session = Depends(get_read_db)):
+    return cached_lookup(reference_cache.cost_item_cache.get(db), q, request, response)
 
 @router.get("/source-funding", response_model=List[lookup_schema.SourceFunding])
-def get_source_funding_list(q: Optional[str] = None, db: Session = Depends(get_db)):
-    query = db.query(models.Source_Funding)
-    if q:
-        search_term = f"%{q}%"
-        query = query.filter(or_(models.Source_Funding.name_ru.ilike(search_term), models.Source_Funding.name_kz.ilike(search_term)))
-    return query.limit(50).all()
+def get_source_funding_list(request: Request, response: Response, q: Optional[str] = None, db: Session = Depends(get_read_db)):
+    return cached_lookup(reference_cache.source_funding_cache.get(db), q, request, response)
 
 @router.get("/enstru", response_model=List[lookup_schema.Enstru])
-def get_enstru_list(q: Optional[str] = None, db: Session = Depends(get_db)):
-    query = db.query(models.Enstru)
-    if q:
-        search_term = f"%{q}%"
-        query = query.filter(
-            or_(
-                models.Enstru.code.ilike(search_term),
-                models.Enstru.name_ru.ilike(search_term),
-                models.Enstru.name_kz.ilike(search_term)
-            )
-        )
-    return query.limit(50).all()
+def get_enstru_list(q: Optional[str] = None, db: Session = Depends(get_read_db)):
+    """Поиск по ЕНС ТРУ через индекс в памяти (см. services/enstru_search.py)."""
+    return enstru_search.search_enstru(db, q)
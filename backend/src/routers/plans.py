@@ -1,13 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-import io
-from ..database.database import get_db
+from typing import List, Literal, Optional, Union
+from ..database.database import get_db, get_read_db
 from ..schemas import plan as plan_schema
-from ..services import plan_service
+from ..services import plan_service, export_cache
 from ..utils.auth import get_current_user
 from ..models import models
+from ..utils.file_response import cached_file_response
+from ..utils.responses import PydanticJSONResponse
 
 router = APIRouter(
     prefix="/plans",
@@ -15,6 +16,35 @@ router = APIRouter(
     dependencies=[Depends(get_current_user)]
 )
 
+def verify_plan_owner(
+    plan_id: int,
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user)
+) -> int:
+    """
+    Проверяет, что план существует и принадлежит текущему пользователю.
+    Не загружает план целиком — только ID владельца. Читает через сессию чтения:
+    владелец плана не меняется, а своя новая запись видна благодаря sticky-cookie.
+    """
+    owner_id = plan_service.get_plan_owner_id(db, plan_id)
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail="План не найден")
+    if owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Нет прав для доступа к этому плану")
+    return plan_id
+
+def response_view(
+    request: Request,
+    view: Optional[Literal["full", "compact"]] = Query(
+        None, description="compact — позиции плоскими строками и общий список справочников"
+    )
+) -> str:
+    """Вид ответа: параметр view или Accept: application/json; profile="compact"."""
+    if view:
+        return view
+    accept = request.headers.get("accept", "").replace('"', "")
+    return "compact" if "profile=compact" in accept else "full"
+
 # ========= Эндпоинты для Планов (ProcurementPlan) =========
 
 @router.post("/", response_model=plan_schema.ProcurementPlan, status_code=status.HTTP_201_CREATED)
@@ -29,58 +59,68 @@ def create_procurement_plan(
     """
     return plan_service.create_plan(db=db, plan_in=plan_in, user=current_user)
 
-@router.get("/", response_model=List[plan_schema.ProcurementPlanWithVersions])
+@router.get("/", response_model=plan_schema.ProcurementPlanSummaryPage)
 def read_user_procurement_plans(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    year: Optional[int] = None,
+    plan_status: Optional[models.PlanStatus] = Query(None, alias="status"),
+    cursor: Optional[int] = None,
+    limit: int = Query(plan_service.PLAN_PAGE_LIMIT, ge=1, le=500),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """
-    Получить список планов закупок для текущего пользователя со всеми их версиями.
+    Получить список планов текущего пользователя (сводка по активной версии).
+    Следующая страница запрашивается с cursor=next_cursor.
     """
-    plans = plan_service.get_plans_by_user(db, user=current_user, skip=skip, limit=limit)
-    return plans
+    return plan_service.get_plan_summaries(
+        db, user=current_user, year=year, plan_status=plan_status, cursor=cursor, limit=limit
+    )
 
-@router.get("/{plan_id}", response_model=plan_schema.ProcurementPlanWithFullActiveVersion)
+@router.get(
+    "/{plan_id}",
+    response_model=Union[plan_schema.ProcurementPlanWithFullActiveVersion, plan_schema.ProcurementPlanCompact],
+    dependencies=[Depends(verify_plan_owner)]
+)
 def read_procurement_plan_with_active_version(
     plan_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    view: str = Depends(response_view),
+    db: Session = Depends(get_read_db)
 ):
     """
-    Получить конкретный план по ID с его активной версией и всеми позициями.
+    Получить конкретный план по ID с его активной версией и всеми ее позициями.
+    Остальные версии возвращаются без позиций.
     """
-    db_plan = plan_service.get_plan_with_active_version(db, plan_id=plan_id)
-    if db_plan is None:
-        raise HTTPException(status_code=404, detail="План не найден")
-    if db_plan.created_by != current_user.id:
-        raise HTTPException(status_code=403, detail="Нет прав для доступа к этому плану")
-    return db_plan
+    if view == "full":
+        return PydanticJSONResponse(
+            plan_schema.ProcurementPlanWithFullActiveVersion,
+            plan_service.get_plan_with_active_version(db, plan_id=plan_id)
+        )
+
+    return PydanticJSONResponse(plan_schema.ProcurementPlanCompact, plan_service.get_plan_compact(db, plan_id=plan_id))
 
-@router.delete("/{plan_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/{plan_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(verify_plan_owner)])
 def delete_procurement_plan(
     plan_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: Session = Depends(get_db)
 ):
     """
     Удалить план закупок.
     Удаление возможно, только если план никогда не был одобрен.
     """
-    db_plan = plan_service.get_plan_with_active_version(db, plan_id=plan_id)
-    if db_plan is None:
-        raise HTTPException(status_code=404, detail="План не найден")
-    if db_plan.created_by != current_user.id:
-        raise HTTPException(status_code=403, detail="Нет прав для удаления этого плана")
-
     plan_service.delete_plan(db=db, plan_id=plan_id)
     return {"ok": True}
 
 
 # ========= Эндпоинты для Версий Плана (ProcurementPlanVersion) =========
 
-@router.post("/{plan_id}/versions", response_model=plan_schema.ProcurementPlanVersion)
+@router.get("/{plan_id}/versions", response_model=List[plan_schema.ProcurementPlanVersion], dependencies=[Depends(verify_plan_owner)])
+def read_plan_versions(plan_id: int, db: Session = Depends(get_read_db)):
+    """
+    История версий плана (без позиций).
+    """
+    return plan_service.get_plan_versions(db, plan_id)
+
+@router.post("/{plan_id}/versions", response_model=plan_schema.ProcurementPlanVersion, dependencies=[Depends(verify_plan_owner)])
 def create_new_version(
     plan_id: int,
     db: Session = Depends(get_db),
@@ -90,13 +130,9 @@ def create_new_version(
     Создать новую версию (v+1) для редактирования из последней одобренной.
     Старая версия становится неактивной, новая - активной со статусом DRAFT.
     """
-    db_plan = plan_service.get_plan_with_active_version(db, plan_id=plan_id)
-    if db_plan.created_by != current_user.id:
-        raise HTTPException(status_code=403, detail="Нет прав для создания новой версии")
-
     return plan_service.create_new_version_for_editing(db=db, plan_id=plan_id, user=current_user)
 
-@router.patch("/{plan_id}/versions/active/status", response_model=plan_schema.ProcurementPlanVersion)
+@router.patch("/{plan_id}/versions/active/status", response_model=plan_schema.ProcurementPlanVersion, dependencies=[Depends(verify_plan_owner)])
 def update_active_version_status(
     plan_id: int,
     status_in: plan_schema.ProcurementPlanStatusUpdate,
@@ -106,14 +142,10 @@ def update_active_version_status(
     """
     Обновить статус активной версии плана (DRAFT -> PRE_APPROVED -> APPROVED).
     """
-    db_plan = plan_service.get_plan_with_active_version(db, plan_id=plan_id)
-    if db_plan.created_by != current_user.id:
-        raise HTTPException(status_code=403, detail="Нет прав для изменения статуса")
-
     return plan_service.update_plan_status(db=db, plan_id=plan_id, new_status=status_in.status, user=current_user)
 
 
-@router.delete("/{plan_id}/versions/latest", status_code=status.HTTP_200_OK)
+@router.delete("/{plan_id}/versions/latest", status_code=status.HTTP_200_OK, dependencies=[Depends(verify_plan_owner)])
 def delete_latest_plan_version(
     plan_id: int,
     db: Session = Depends(get_db),
@@ -123,36 +155,111 @@ def delete_latest_plan_version(
     Удалить последнюю версию, если она в статусе DRAFT.
     Предыдущая версия автоматически становится активной.
     """
-    db_plan = plan_service.get_plan_with_active_version(db, plan_id=plan_id)
-    if db_plan.created_by != current_user.id:
-        raise HTTPException(status_code=403, detail="Нет прав для удаления версии")
-
     return plan_service.delete_latest_version(db=db, plan_id=plan_id, user=current_user)
 
 
-@router.get("/{plan_id}/versions/{version_id}/export-excel")
+@router.get(
+    "/{plan_id}/versions/{version_id}/items",
+    response_model=Union[plan_schema.PlanItemPage, plan_schema.PlanItemPageCompact],
+    dependencies=[Depends(verify_plan_owner)]
+)
+def read_version_items(
+    plan_id: int,
+    version_id: int,
+    filters: plan_schema.PlanItemFilter = Depends(),
+    sort: Literal["item_number", "total_amount", "price_per_unit", "quantity", "trucode"] = "item_number",
+    order: Literal["asc", "desc"] = "asc",
+    cursor: Optional[str] = Query(None, description="next_cursor из предыдущей страницы"),
+    limit: int = Query(100, ge=1, le=1000),
+    view: str = Depends(response_view),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Получить позиции любой версии плана постранично, с фильтрами и сортировкой.
+    По умолчанию удаленные позиции не возвращаются.
+    """
+    page = plan_service.get_version_items_page(
+        db, plan_id=plan_id, version_id=version_id, filters=filters,
+        sort=sort, order=order, cursor=cursor, limit=limit, with_lookups=view == "full"
+    )
+    if view == "full":
+        return PydanticJSONResponse(plan_schema.PlanItemPage, page)
+
+    page["lookups"] = plan_service.collect_item_lookups(db, page["items"])
+    return PydanticJSONResponse(plan_schema.PlanItemPageCompact, page)
+
+
+@router.get("/{plan_id}/versions/{version_id}/ktp-check", response_model=List[plan_schema.PlanItemKtpStatus], dependencies=[Depends(verify_plan_owner)])
+def check_version_ktp(
+    plan_id: int,
+    version_id: int,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Проверить все позиции версии по реестру КТП одним запросом.
+    in_registry — код ЕНС ТРУ есть в реестре, is_ktp — признак, сохраненный в позиции.
+    """
+    return plan_service.get_version_ktp_status(db, plan_id=plan_id, version_id=version_id)
+
+
+@router.get("/{plan_id}/versions/{from_version_id}/diff/{to_version_id}", response_model=plan_schema.PlanVersionDiff, dependencies=[Depends(verify_plan_owner)])
+def diff_versions(
+    plan_id: int,
+    from_version_id: int,
+    to_version_id: int,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Сравнить две версии плана: добавленные, удаленные и измененные позиции
+    (по item_number) с дельтами полей, а также дельты итогов и процентов КТП.
+    """
+    return PydanticJSONResponse(
+        plan_schema.PlanVersionDiff,
+        plan_service.get_versions_diff(db, plan_id=plan_id, from_version_id=from_version_id, to_version_id=to_version_id)
+    )
+
+
+@router.post("/{plan_id}/versions/{version_id}/recalculate", response_model=plan_schema.ProcurementPlanVersion, dependencies=[Depends(verify_plan_owner)])
+def recalculate_version_metrics(
+    plan_id: int,
+    version_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Полностью пересчитать суммы и проценты КТП версии по ее позициям.
+    Обычно метрики обновляются инкрементально; эндпоинт нужен для проверки согласованности.
+    """
+    return plan_service.recalculate_version(db=db, plan_id=plan_id, version_id=version_id)
+
+
+@router.get("/{plan_id}/versions/{version_id}/export-excel", dependencies=[Depends(verify_plan_owner)])
 def export_version_to_excel(
     plan_id: int,
     version_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    request: Request,
+    db: Session = Depends(get_db)
 ):
-    """Экспортировать конкретную версию сметы в Excel."""
-    db_plan = plan_service.get_plan_with_active_version(db, plan_id=plan_id)
-    if db_plan.created_by != current_user.id:
-        raise HTTPException(status_code=403, detail="Нет прав для экспорта")
+    """
+    Экспортировать конкретную версию сметы в Excel.
+    Одобренные версии неизменны, поэтому их выгрузка собирается один раз и отдается из кэша на диске.
+    """
+    version = plan_service.get_export_version(db, plan_id, version_id)
+    media_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    filename = f"plan_{plan_id}_v{version_id}.xlsx"
 
-    excel_data = plan_service.export_plan_to_excel(db, plan_id, version_id)
+    if version.status == models.PlanStatus.APPROVED:
+        path, etag = export_cache.get_approved_export(plan_id, version.id, version.version_number)
+        return cached_file_response(request, path, etag, media_type, filename)
 
     return StreamingResponse(
-        io.BytesIO(excel_data),
-        media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        headers={'Content-Disposition': f'attachment; filename="plan_{plan_id}_v{version_id}.xlsx"'}
+        plan_service.stream_plan_to_excel(plan_id, version.id, version.version_number),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
     )
 
 # ========= Эндпоинты для Позиций (PlanItem) в контексте Плана =========
 
-@router.post("/{plan_id}/items", response_model=plan_schema.PlanItem, status_code=status.HTTP_201_CREATED)
+@router.post("/{plan_id}/items", response_model=plan_schema.PlanItem, status_code=status.HTTP_201_CREATED, dependencies=[Depends(verify_plan_owner)])
 def create_plan_item_for_active_version(
     plan_id: int,
     item_in: plan_schema.PlanItemCreate,
@@ -162,8 +269,31 @@ def create_plan_item_for_active_version(
     """
     Добавить новую позицию в активную версию сметы.
     """
-    db_plan = plan_service.get_plan_with_active_version(db, plan_id=plan_id)
-    if db_plan.created_by != current_user.id:
-        raise HTTPException(status_code=403, detail="Нет прав для добавления в эту смету")
-
     return plan_service.add_item_to_plan(db=db, plan_id=plan_id, item_in=item_in, user=current_user)
+
+@router.post("/{plan_id}/items:bulk", response_model=plan_schema.PlanItemBulkResult, status_code=status.HTTP_201_CREATED, dependencies=[Depends(verify_plan_owner)])
+def create_plan_items_bulk(
+    plan_id: int,
+    bulk_in: plan_schema.PlanItemBulkCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Добавить сразу много позиций в активную версию сметы одной транзакцией.
+    Если хотя бы одна ссылка на справочник не найдена, ничего не добавляется.
+    """
+    return plan_service.add_items_to_plan_bulk(db=db, plan_id=plan_id, items_in=bulk_in.items, user=current_user)
+
+@router.post("/{plan_id}/items:import", response_model=plan_schema.PlanItemImportResult, dependencies=[Depends(verify_plan_owner)])
+def import_plan_items(
+    plan_id: int,
+    file: UploadFile = File(..., description="XLSX в формате выгрузки export-excel (или CSV с теми же заголовками)"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Импортировать позиции в активную версию (черновик) из Excel.
+    Корректные строки добавляются одной транзакцией, по остальным возвращается отчет с номерами строк.
+    """
+    items, errors = plan_service.parse_items_file(file.file, file.filename or "")
+    return plan_service.import_items_to_plan(db, plan_id=plan_id, items=items, errors=errors, user=current_user)
@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+from decimal import Decimal
+from ..models.models import NeedType
+
+SpendingDimension = Literal[
+    "expense_item_id", "funding_source_id", "need_type", "kato_delivery_id", "is_ktp",
+    "plan_id", "year", "org_bin",
+]
+SpendingScope = Literal["approved", "active"]
+
+class SpendingRow(BaseModel):
+    """Сумма по одной комбинации измерений; заполнены только поля из group_by."""
+    expense_item_id: Optional[int] = None
+    funding_source_id: Optional[int] = None
+    need_type: Optional[NeedType] = None
+    kato_delivery_id: Optional[int] = None
+    is_ktp: Optional[bool] = None
+    plan_id: Optional[int] = None
+    year: Optional[int] = None
+    org_bin: Optional[str] = None
+    total_amount: Decimal
+    item_count: int
+
+class SpendingReport(BaseModel):
+    scope: SpendingScope
+    group_by: List[SpendingDimension]
+    total_amount: Decimal
+    item_count: int
+    rows: List[SpendingRow]
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List
 
 class KatoSchema(BaseModel):
     id: int
@@ -10,3 +11,8 @@ class KatoSchema(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class KatoPathSchema(BaseModel):
+    id: int
+    path: List[KatoSchema]
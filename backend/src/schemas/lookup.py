@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 from datetime import date
 
 # Схема для User (для отображения в других схемах)
@@ -74,6 +74,13 @@ class Enstru(BaseModel):
     class Config:
         from_attributes = True
 
+# Пакетная проверка по реестру КТП
+class KtpCheckRequest(BaseModel):
+    codes: List[str] = Field(..., min_length=1, max_length=10000)
+
+class KtpCheckResult(BaseModel):
+    results: Dict[str, bool]
+
 # --- Схемы для ответа эндпоинта редактирования ---
 
 class InitialOptions(BaseModel):
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from decimal import Decimal
 from ..models.models import NeedType, PlanStatus
@@ -10,6 +10,7 @@ from . import lookup as lookup_schema
 class ProcurementPlanVersionBase(BaseModel):
     status: PlanStatus
     total_amount: Decimal = Field(default=0)
+    ktp_amount: Optional[Decimal] = Field(default=0)
     ktp_percentage: Optional[Decimal] = Field(default=0)
     import_percentage: Optional[Decimal] = Field(default=0)
     is_active: bool
@@ -42,6 +43,9 @@ class PlanItemBase(BaseModel):
 class PlanItemCreate(PlanItemBase):
     pass
 
+class PlanItemBulkCreate(BaseModel):
+    items: List[PlanItemCreate] = Field(..., min_length=1, max_length=5000)
+
 class PlanItemUpdate(PlanItemBase):
     trucode: Optional[str] = None
     unit_id: Optional[int] = None
@@ -82,6 +86,80 @@ class PlanItem(BaseModel):
 class ProcurementPlanVersionWithItems(ProcurementPlanVersion):
     items: List[PlanItem] = []
 
+class PlanItemBulkResult(BaseModel):
+    """Результат пакетного добавления позиций."""
+    created: int
+    first_item_number: int
+    last_item_number: int
+    version: ProcurementPlanVersion
+
+class PlanItemImportError(BaseModel):
+    """Ошибка в строке импортируемого файла (row — номер строки в Excel)."""
+    row: int
+    field: Optional[str] = None
+    value: Any = None
+    message: str
+
+class PlanItemImportResult(BaseModel):
+    """Результат импорта позиций из Excel: корректные строки добавлены, остальные перечислены в errors."""
+    rows: int
+    created: int
+    first_item_number: Optional[int] = None
+    last_item_number: Optional[int] = None
+    errors: List[PlanItemImportError]
+    version: ProcurementPlanVersion
+
+class PlanItemSnapshot(BaseModel):
+    """Позиция версии в сравнении версий (добавленная или удаленная)."""
+    item_number: int
+    trucode: str
+    need_type: NeedType
+    unit_id: Optional[int] = None
+    expense_item_id: int
+    funding_source_id: int
+    agsk_id: Optional[str] = None
+    kato_purchase_id: Optional[int] = None
+    kato_delivery_id: Optional[int] = None
+    quantity: Decimal
+    price_per_unit: Decimal
+    total_amount: Decimal
+    is_ktp: bool
+    is_resident: bool
+
+class PlanItemFieldChange(BaseModel):
+    old: Any = None
+    new: Any = None
+
+class PlanItemDiff(BaseModel):
+    """Позиция, которая есть в обеих версиях, но отличается: изменившиеся поля."""
+    item_number: int
+    changes: Dict[str, PlanItemFieldChange]
+    total_amount_delta: Decimal
+
+class PlanVersionDiffTotals(BaseModel):
+    total_amount_delta: Decimal
+    ktp_amount_delta: Decimal
+    ktp_percentage_delta: Decimal
+    import_percentage_delta: Decimal
+
+class PlanVersionDiff(BaseModel):
+    """Отличия версии to_version от from_version (позиции сопоставлены по item_number)."""
+    from_version: ProcurementPlanVersion
+    to_version: ProcurementPlanVersion
+    totals: PlanVersionDiffTotals
+    added: List[PlanItemSnapshot]
+    removed: List[PlanItemSnapshot]
+    changed: List[PlanItemDiff]
+    unchanged_count: int
+
+class PlanItemKtpStatus(BaseModel):
+    """Позиция версии и результат ее проверки по реестру КТП."""
+    item_id: int
+    item_number: int
+    trucode: str
+    is_ktp: bool
+    in_registry: bool
+
 # ========= Схемы для Плана Закупок (ProcurementPlan) =========
 
 class ProcurementPlanBase(BaseModel):
@@ -105,15 +183,96 @@ class ProcurementPlanWithVersions(ProcurementPlan):
     """План со списком всех его версий (без позиций)."""
     versions: List[ProcurementPlanVersion] = []
 
+class ProcurementPlanSummary(ProcurementPlan):
+    """Строка списка планов: активная версия и агрегаты по версиям, без вложенных объектов."""
+    active_version_id: Optional[int] = None
+    active_version_number: Optional[int] = None
+    status: Optional[PlanStatus] = None
+    total_amount: Optional[Decimal] = None
+    ktp_percentage: Optional[Decimal] = None
+    versions_count: int = 0
+    has_approved_versions: bool = False
+
+class ProcurementPlanSummaryPage(BaseModel):
+    """Страница списка планов; next_cursor — ID, передаваемый в cursor для следующей страницы."""
+    items: List[ProcurementPlanSummary]
+    next_cursor: Optional[int] = None
+
 class ProcurementPlanWithFullActiveVersion(ProcurementPlan):
-    """План с полной информацией по активной версии, включая все ее позиции."""
-    versions: List[ProcurementPlanVersionWithItems] = []
+    """
+    План с полной информацией по активной версии, включая все ее позиции.
+    Остальные версии — без позиций; их позиции доступны постранично
+    через /plans/{plan_id}/versions/{version_id}/items.
+    """
+    active_version: Optional[ProcurementPlanVersionWithItems] = None
+    versions: List[ProcurementPlanVersion] = []
 
     def get_active_version(self) -> Optional[ProcurementPlanVersionWithItems]:
-        for v in self.versions:
-            if v.is_active:
-                return v
-        return None
+        return self.active_version
+
+# ========= Компактное представление (view=compact) =========
+
+class PlanItemCompact(BaseModel):
+    """Позиция без вложенных объектов: только ID справочников."""
+    id: int
+    version_id: int
+    item_number: int
+    need_type: NeedType
+    trucode: str
+    unit_id: Optional[int] = None
+    expense_item_id: int
+    funding_source_id: int
+    agsk_id: Optional[str] = None
+    kato_purchase_id: Optional[int] = None
+    kato_delivery_id: Optional[int] = None
+    quantity: Decimal
+    price_per_unit: Decimal
+    total_amount: Decimal
+    is_ktp: bool
+    is_resident: bool
+    is_deleted: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ItemLookups(BaseModel):
+    """Справочные записи, на которые ссылаются позиции ответа, — каждая по одному разу."""
+    enstru: List[lookup_schema.Enstru] = []
+    mkei: List[lookup_schema.Mkei] = []
+    cost_items: List[lookup_schema.CostItem] = []
+    source_funding: List[lookup_schema.SourceFunding] = []
+    agsk: List[lookup_schema.Agsk] = []
+    kato: List[lookup_schema.Kato] = []
+
+class ProcurementPlanVersionWithCompactItems(ProcurementPlanVersion):
+    items: List[PlanItemCompact] = []
+
+class ProcurementPlanCompact(ProcurementPlan):
+    active_version: Optional[ProcurementPlanVersionWithCompactItems] = None
+    versions: List[ProcurementPlanVersion] = []
+    lookups: ItemLookups
+
+class PlanItemPageCompact(BaseModel):
+    items: List[PlanItemCompact] = []
+    total: int
+    next_cursor: Optional[str] = None
+    lookups: ItemLookups
+
+class PlanItemFilter(BaseModel):
+    """Фильтры списка позиций версии."""
+    need_type: Optional[NeedType] = None
+    is_ktp: Optional[bool] = None
+    expense_item_id: Optional[int] = None
+    funding_source_id: Optional[int] = None
+    trucode: Optional[str] = Field(None, description="Часть кода ЕНС ТРУ")
+    include_deleted: bool = False
+
+class PlanItemPage(BaseModel):
+    """Страница позиций версии; next_cursor передается в cursor для следующей страницы."""
+    items: List[PlanItem] = []
+    total: int
+    next_cursor: Optional[str] = None
 
 # ========= Схемы для обновления статуса =========
 
@@ -0,0 +1,10 @@
+"""
+Асинхронные версии отчетов аналитики (DB_MODE=async), см. aio/plan_service.py.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import analytics_service
+
+
+async def get_spending_totals(db: AsyncSession, group_by: list[str], **params) -> dict:
+    return await db.run_sync(analytics_service.get_spending_totals, group_by, **params)
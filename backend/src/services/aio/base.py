@@ -0,0 +1,20 @@
+from typing import Any, Callable
+
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...utils.responses import _adapter
+
+
+async def run_validated(db: AsyncSession, schema, fn: Callable, *args, **kwargs) -> Any:
+    """
+    Выполняет синхронный сервис в greenlet AsyncSession и сразу валидирует результат
+    по схеме. Ленивые связи ORM-объектов догружаются здесь же, поэтому наружу
+    уходят готовые pydantic-модели, которые можно сериализовать вне сессии.
+    """
+    adapter: TypeAdapter = _adapter(schema)
+
+    def call(session):
+        return adapter.validate_python(fn(session, *args, **kwargs), from_attributes=True)
+
+    return await db.run_sync(call)
@@ -0,0 +1,29 @@
+"""Асинхронные версии сервисов позиций (DB_MODE=async), см. aio/plan_service.py."""
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...models import models
+from ...schemas import plan as plan_schema
+from .. import item_service
+from .base import run_validated
+
+
+async def get_item_for_user(db: AsyncSession, item_id: int, user: models.User) -> plan_schema.PlanItem:
+    """Позиция по ID с проверкой, что план принадлежит пользователю."""
+    def load(session):
+        db_item = item_service.get_item(session, item_id=item_id)
+        if db_item is None:
+            raise HTTPException(status_code=404, detail="Позиция не найдена")
+        if db_item.version.plan.created_by != user.id:
+            raise HTTPException(status_code=403, detail="Нет прав для доступа к этой позиции")
+        return db_item
+
+    return await run_validated(db, plan_schema.PlanItem, load)
+
+
+async def update_item(db: AsyncSession, item_id: int, item_in: plan_schema.PlanItemUpdate, user: models.User) -> plan_schema.PlanItem:
+    return await run_validated(db, plan_schema.PlanItem, item_service.update_item, item_id, item_in, user)
+
+
+async def delete_item(db: AsyncSession, item_id: int, user: models.User) -> bool:
+    return await db.run_sync(item_service.delete_item, item_id, user)
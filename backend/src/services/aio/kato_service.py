@@ -0,0 +1,23 @@
+"""
+Асинхронные версии сервисов KATO (DB_MODE=async), см. aio/plan_service.py.
+Дерево живет в памяти, к БД обращаемся только при первой загрузке.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import kato_service
+
+
+async def get_kato_children(db: AsyncSession, parent_id: int | None = 0) -> list[dict]:
+    return await db.run_sync(kato_service.get_kato_children, parent_id)
+
+
+async def get_kato_by_id(db: AsyncSession, kato_id: int) -> dict | None:
+    return await db.run_sync(kato_service.get_kato_by_id, kato_id)
+
+
+async def get_kato_parents(db: AsyncSession, kato_id: int) -> list[dict]:
+    return await db.run_sync(kato_service.get_kato_parents, kato_id)
+
+
+async def get_kato_paths(db: AsyncSession, kato_ids: list[int]) -> list[dict]:
+    return await db.run_sync(kato_service.get_kato_paths, kato_ids)
@@ -0,0 +1,46 @@
+"""
+Асинхронные справочники (DB_MODE=async).
+Справочники и реестр КТП из памяти читаются через run_sync (БД нужна только
+при перезагрузке), поиск по KATO/АГСК — обычными асинхронными запросами.
+"""
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...models import models
+from .. import enstru_search, ktp_registry, reference_cache
+
+LOOKUP_LIMIT = 50
+
+
+async def get_reference_table(db: AsyncSession, table: reference_cache.ReferenceTable) -> reference_cache.ReferenceSnapshot:
+    return await db.run_sync(table.get)
+
+
+async def search_enstru(db: AsyncSession, q: str | None) -> list[dict]:
+    return await db.run_sync(enstru_search.search_enstru, q)
+
+
+async def is_ktp(db: AsyncSession, enstru_code: str) -> bool:
+    return await db.run_sync(ktp_registry.is_ktp, enstru_code)
+
+
+async def check_ktp_codes(db: AsyncSession, enstru_codes: list[str]) -> dict[str, bool]:
+    return await db.run_sync(ktp_registry.check_codes, enstru_codes)
+
+
+async def search_kato(db: AsyncSession, q: str | None) -> list[models.Kato]:
+    query = select(models.Kato)
+    if q:
+        search_term = f"%{q}%"
+        query = query.where(or_(models.Kato.code.ilike(search_term), models.Kato.name_ru.ilike(search_term)))
+    return list(await db.scalars(query.limit(LOOKUP_LIMIT)))
+
+
+async def search_agsk(db: AsyncSession, q: str | None) -> list[models.Agsk]:
+    query = select(models.Agsk)
+    if q:
+        search_term = f"%{q}%"
+        query = query.where(or_(models.Agsk.group.ilike(search_term),
+                                models.Agsk.code.ilike(search_term),
+                                models.Agsk.name_ru.ilike(search_term)))
+    return list(await db.scalars(query.limit(LOOKUP_LIMIT)))
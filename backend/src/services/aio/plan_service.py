@@ -0,0 +1,105 @@
+"""
+Асинхронные версии сервисов планов (DB_MODE=async).
+
+Логика остается в services/plan_service.py: каждая функция выполняет ее
+через AsyncSession.run_sync, поэтому запрос не занимает поток из пула,
+пока ждет БД, а правила в обоих режимах одинаковые.
+"""
+from typing import List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...models import models
+from ...schemas import plan as plan_schema
+from .. import plan_service
+from .base import run_validated
+
+
+async def get_plan_owner_id(db: AsyncSession, plan_id: int) -> int | None:
+    return await db.run_sync(plan_service.get_plan_owner_id, plan_id)
+
+
+async def create_plan(db: AsyncSession, plan_in: plan_schema.ProcurementPlanCreate, user: models.User) -> plan_schema.ProcurementPlan:
+    return await run_validated(db, plan_schema.ProcurementPlan, plan_service.create_plan, plan_in, user)
+
+
+async def get_plan_summaries(db: AsyncSession, user: models.User, **params) -> plan_schema.ProcurementPlanSummaryPage:
+    return await run_validated(db, plan_schema.ProcurementPlanSummaryPage, plan_service.get_plan_summaries, user, **params)
+
+
+async def get_plan_with_active_version(db: AsyncSession, plan_id: int) -> plan_schema.ProcurementPlanWithFullActiveVersion:
+    return await run_validated(
+        db, plan_schema.ProcurementPlanWithFullActiveVersion, plan_service.get_plan_with_active_version, plan_id
+    )
+
+
+async def get_plan_compact(db: AsyncSession, plan_id: int) -> plan_schema.ProcurementPlanCompact:
+    return await run_validated(db, plan_schema.ProcurementPlanCompact, plan_service.get_plan_compact, plan_id)
+
+
+async def get_plan_versions(db: AsyncSession, plan_id: int) -> List[plan_schema.ProcurementPlanVersion]:
+    return await run_validated(db, List[plan_schema.ProcurementPlanVersion], plan_service.get_plan_versions, plan_id)
+
+
+async def get_version_items_page(db: AsyncSession, plan_id: int, version_id: int, view: str = "full", **params):
+    """Страница позиций версии; для view=compact — вместе со списком справочников."""
+    def page(session):
+        result = plan_service.get_version_items_page(
+            session, plan_id=plan_id, version_id=version_id, with_lookups=view == "full", **params
+        )
+        if view != "full":
+            result["lookups"] = plan_service.collect_item_lookups(session, result["items"])
+        return result
+
+    schema = plan_schema.PlanItemPage if view == "full" else plan_schema.PlanItemPageCompact
+    return await run_validated(db, schema, page)
+
+
+async def get_version_ktp_status(db: AsyncSession, plan_id: int, version_id: int) -> list[dict]:
+    return await db.run_sync(plan_service.get_version_ktp_status, plan_id, version_id)
+
+
+async def get_versions_diff(db: AsyncSession, plan_id: int, from_version_id: int, to_version_id: int) -> plan_schema.PlanVersionDiff:
+    return await run_validated(
+        db, plan_schema.PlanVersionDiff, plan_service.get_versions_diff, plan_id, from_version_id, to_version_id
+    )
+
+
+async def update_plan_status(db: AsyncSession, plan_id: int, new_status: models.PlanStatus, user: models.User) -> plan_schema.ProcurementPlanVersion:
+    return await run_validated(
+        db, plan_schema.ProcurementPlanVersion, plan_service.update_plan_status, plan_id, new_status, user
+    )
+
+
+async def recalculate_version(db: AsyncSession, plan_id: int, version_id: int) -> plan_schema.ProcurementPlanVersion:
+    return await run_validated(db, plan_schema.ProcurementPlanVersion, plan_service.recalculate_version, plan_id, version_id)
+
+
+async def create_new_version_for_editing(db: AsyncSession, plan_id: int, user: models.User) -> plan_schema.ProcurementPlanVersion:
+    return await run_validated(
+        db, plan_schema.ProcurementPlanVersion, plan_service.create_new_version_for_editing, plan_id, user
+    )
+
+
+async def delete_latest_version(db: AsyncSession, plan_id: int, user: models.User):
+    return await db.run_sync(plan_service.delete_latest_version, plan_id, user)
+
+
+async def delete_plan(db: AsyncSession, plan_id: int):
+    return await db.run_sync(plan_service.delete_plan, plan_id)
+
+
+async def get_export_version(db: AsyncSession, plan_id: int, version_id: int) -> models.ProcurementPlanVersion:
+    return await db.run_sync(plan_service.get_export_version, plan_id, version_id)
+
+
+async def add_item_to_plan(db: AsyncSession, plan_id: int, item_in: plan_schema.PlanItemCreate, user: models.User) -> plan_schema.PlanItem:
+    return await run_validated(db, plan_schema.PlanItem, plan_service.add_item_to_plan, plan_id, item_in, user)
+
+
+async def add_items_to_plan_bulk(db: AsyncSession, plan_id: int, items_in: list[plan_schema.PlanItemCreate], user: models.User) -> plan_schema.PlanItemBulkResult:
+    return await run_validated(db, plan_schema.PlanItemBulkResult, plan_service.add_items_to_plan_bulk, plan_id, items_in, user)
+
+
+async def import_items_to_plan(db: AsyncSession, plan_id: int, items: list, errors: list[dict], user: models.User) -> plan_schema.PlanItemImportResult:
+    return await run_validated(db, plan_schema.PlanItemImportResult, plan_service.import_items_to_plan, plan_id, items, errors, user)
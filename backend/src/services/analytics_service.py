@@ -0,0 +1,179 @@
+from decimal import Decimal
+from typing import Iterable
+
+from sqlalchemy import and_, delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+from ..models import models
+
+# Измерения, по которым ведется сводная таблица spending_rollups
+ROLLUP_FIELDS = ("expense_item_id", "funding_source_id", "need_type", "kato_delivery_id", "is_ktp")
+
+# ========= Ведение сводной таблицы =========
+
+def _item_values(item) -> dict:
+    if isinstance(item, dict):
+        return item
+    return {field: getattr(item, field) for field in (*ROLLUP_FIELDS, "total_amount", "is_deleted")}
+
+def collect_deltas(items: Iterable, sign: int = 1, deltas: dict | None = None) -> dict:
+    """
+    Вклад позиций в сводную таблицу: {значения измерений: (сумма, число позиций)}.
+    sign=-1 — вычесть (старое состояние измененной или удаленной позиции).
+    Позиции — ORM-объекты или словари полей; удаленные не учитываются.
+    """
+    deltas = {} if deltas is None else deltas
+    for item in items:
+        values = _item_values(item)
+        if values.get("is_deleted"):
+            continue
+        key = tuple(bool(values[f]) if f == "is_ktp" else values[f] for f in ROLLUP_FIELDS)
+        amount, count = deltas.get(key, (Decimal("0.00"), 0))
+        deltas[key] = (amount + sign * Decimal(values["total_amount"] or 0), count + sign)
+    return deltas
+
+def _group_filter(version_id: int, key: tuple):
+    rollup = models.SpendingRollup
+    conditions = [rollup.version_id == version_id]
+    for field, value in zip(ROLLUP_FIELDS, key):
+        column = getattr(rollup, field)
+        conditions.append(column.is_(None) if value is None else column == value)
+    return and_(*conditions)
+
+def apply_deltas(db: Session, version_id: int, deltas: dict):
+    """
+    Применяет изменения к строкам версии в spending_rollups: UPDATE по группе,
+    для новой группы — INSERT. Групп обычно единицы, поэтому и запросов столько же.
+    Коммит остается за вызывающим (как у _apply_version_delta).
+    """
+    rollup = models.SpendingRollup
+    plan_info = None
+    for key, (amount, count) in deltas.items():
+        if not amount and not count:
+            continue
+        updated = db.query(rollup).filter(_group_filter(version_id, key)).update({
+            rollup.total_amount: rollup.total_amount + amount,
+            rollup.item_count: rollup.item_count + count,
+        }, synchronize_session=False)
+        if updated:
+            continue
+        if plan_info is None:
+            plan_info = db.query(models.ProcurementPlan.id, models.ProcurementPlan.year).join(
+                models.ProcurementPlanVersion, models.ProcurementPlanVersion.plan_id == models.ProcurementPlan.id
+            ).filter(models.ProcurementPlanVersion.id == version_id).one()
+        db.execute(insert(rollup).values(
+            version_id=version_id, plan_id=plan_info.id, year=plan_info.year,
+            total_amount=amount, item_count=count,
+            **dict(zip(ROLLUP_FIELDS, key)),
+        ))
+    if any(count < 0 for _, count in deltas.values()):
+        db.query(rollup).filter(rollup.version_id == version_id, rollup.item_count <= 0).delete(synchronize_session=False)
+
+def rebuild_version_rollup(db: Session, version_id: int | None = None):
+    """
+    Полностью пересобирает сводку версии (или всех версий, если version_id не задан)
+    одним INSERT ... SELECT с группировкой по позициям.
+    """
+    rollup, item = models.SpendingRollup, models.PlanItemVersion
+    version, plan = models.ProcurementPlanVersion, models.ProcurementPlan
+    # is_ktp может быть NULL в старых данных — как и в collect_deltas, это False
+    dimensions = [func.coalesce(item.is_ktp, False) if f == "is_ktp" else getattr(item, f) for f in ROLLUP_FIELDS]
+    source = select(
+        item.version_id, version.plan_id, plan.year, *dimensions,
+        func.sum(item.total_amount), func.count(item.id),
+    ).join(version, version.id == item.version_id
+    ).join(plan, plan.id == version.plan_id
+    ).where(item.is_deleted == False
+    ).group_by(item.version_id, version.plan_id, plan.year, *dimensions)
+
+    clear = delete(rollup)
+    if version_id is not None:
+        source = source.where(item.version_id == version_id)
+        clear = clear.where(rollup.version_id == version_id)
+    db.execute(clear)
+    db.execute(insert(rollup).from_select(
+        ["version_id", "plan_id", "year", *ROLLUP_FIELDS, "total_amount", "item_count"], source
+    ))
+
+def copy_version_rollup(db: Session, from_version_id: int, to_version_id: int):
+    """Новая версия начинается с копии позиций предыдущей — копируется и ее сводка."""
+    rollup = models.SpendingRollup
+    copied = ["plan_id", "year", *ROLLUP_FIELDS, "total_amount", "item_count"]
+    source = select(
+        *[getattr(rollup, c) for c in copied],
+        literal(to_version_id).label("version_id"),
+    ).where(rollup.version_id == from_version_id)
+    db.execute(insert(rollup).from_select(copied + ["version_id"], source))
+
+def delete_rollups(db: Session, version_id: int | None = None, plan_id: int | None = None):
+    rollup = models.SpendingRollup
+    query = db.query(rollup)
+    if version_id is not None:
+        query = query.filter(rollup.version_id == version_id)
+    if plan_id is not None:
+        query = query.filter(rollup.plan_id == plan_id)
+    query.delete(synchronize_session=False)
+
+# ========= Отчеты =========
+
+SPENDING_DIMENSIONS = (*ROLLUP_FIELDS, "plan_id", "year", "org_bin")
+
+def _scope_versions(scope: str):
+    """
+    ID версий, попадающих в отчет: approved — последняя одобренная версия каждого плана,
+    active — текущая (в т.ч. черновик).
+    """
+    version = models.ProcurementPlanVersion
+    if scope == "active":
+        return select(version.id).where(version.is_active == True)
+    latest = select(
+        version.plan_id, func.max(version.version_number).label("version_number")
+    ).where(version.status == models.PlanStatus.APPROVED).group_by(version.plan_id).subquery()
+    return select(version.id).join(
+        latest, and_(latest.c.plan_id == version.plan_id, latest.c.version_number == version.version_number)
+    )
+
+def get_spending_totals(
+    db: Session,
+    group_by: list[str],
+    scope: str = "approved",
+    year: int | None = None,
+    plan_id: int | None = None,
+    org_bin: str | None = None,
+    owner_id: int | None = None,
+) -> dict:
+    """
+    Суммы закупок в разрезе измерений по сводной таблице — без чтения позиций.
+    owner_id ограничивает отчет планами одного пользователя.
+    """
+    rollup, plan, user = models.SpendingRollup, models.ProcurementPlan, models.User
+    group_by = list(dict.fromkeys(group_by))
+    columns = {field: getattr(rollup, field) for field in SPENDING_DIMENSIONS if field != "org_bin"}
+    columns["org_bin"] = user.bin
+    selected = [columns[field].label(field) for field in group_by]
+
+    query = select(
+        *selected,
+        func.sum(rollup.total_amount).label("total_amount"),
+        func.sum(rollup.item_count).label("item_count"),
+    ).where(rollup.version_id.in_(_scope_versions(scope)))
+    if "org_bin" in group_by or org_bin is not None or owner_id is not None:
+        query = query.join(plan, plan.id == rollup.plan_id).join(user, user.id == plan.created_by)
+    if year is not None:
+        query = query.where(rollup.year == year)
+    if plan_id is not None:
+        query = query.where(rollup.plan_id == plan_id)
+    if org_bin is not None:
+        query = query.where(user.bin == org_bin)
+    if owner_id is not None:
+        query = query.where(plan.created_by == owner_id)
+    if selected:
+        query = query.group_by(*selected).order_by(*selected)
+
+    rows = [dict(row._mapping) for row in db.execute(query) if row.item_count]
+    return {
+        "scope": scope,
+        "group_by": group_by,
+        "total_amount": sum((row["total_amount"] for row in rows), Decimal("0.00")),
+        "item_count": sum(row["item_count"] for row in rows),
+        "rows": rows,
+    }
@@ -0,0 +1,200 @@
+import hashlib
+import heapq
+import re
+from array import array
+from bisect import bisect_left
+
+from sqlalchemy.orm import Session
+from ..models.models import Enstru
+from .reference_cache import ReferenceIndex, register_reload_hook
+
+# Поля, которые отдаются наружу (совпадают со схемой lookup_schema.Enstru)
+_FIELDS = ("id", "code", "name_ru", "name_kz", "type_ru", "type_kz", "specs_ru", "specs_kz")
+_WORD_RE = re.compile(r"\w+")
+
+DEFAULT_LIMIT = 50
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _is_word_prefix(text: str, q: str) -> bool:
+    """Проверяет, что q встречается в text с начала какого-либо слова."""
+    pos = text.find(q)
+    while pos != -1:
+        if pos == 0 or not text[pos - 1].isalnum():
+            return True
+        pos = text.find(q, pos + 1)
+    return False
+
+
+def _append(postings: dict[str, array], key: str, idx: int):
+    posting = postings.get(key)
+    if posting is None:
+        posting = postings[key] = array("I")
+    posting.append(idx)
+
+
+class EnstruSearchIndex:
+    """
+    Инвертированный индекс по справочнику ЕНС ТРУ в памяти.
+
+    Строки хранятся в порядке кода, поэтому номер строки одновременно
+    служит ключом сортировки внутри одного уровня релевантности:
+    точный код > префикс кода > префикс слова > подстрока.
+
+    version — хэш содержимого, как у ReferenceTable: одинаков во всех воркерах.
+    """
+
+    def __init__(self, rows: list[tuple]):
+        self._rows = rows
+        self._codes: list[str] = []
+        self._names: list[str] = []
+        self._by_code: dict[str, int] = {}
+        self._sorted_codes: list[tuple[str, int]] = []
+        self._words: dict[str, array] = {}
+        self._trigrams: dict[str, array] = {}
+        digest = hashlib.sha1()
+
+        for idx, row in enumerate(rows):
+            digest.update(repr(row).encode())
+            code = row[1].lower()
+            names = f"{row[2]}\n{row[3]}".lower()
+            self._codes.append(code)
+            self._names.append(names)
+            self._by_code.setdefault(code, idx)
+            self._sorted_codes.append((code, idx))
+            for word in set(_WORD_RE.findall(names)):
+                _append(self._words, word, idx)
+            for tg in _trigrams(code) | _trigrams(names):
+                _append(self._trigrams, tg, idx)
+
+        self.version = digest.hexdigest()[:16]
+        self._sorted_codes.sort()
+        self._sorted_words = sorted(self._words)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get_many(self, codes) -> list[dict]:
+        """Строки по точным кодам (без учета регистра); неизвестные коды пропускаются."""
+        found = (self._by_code.get(str(code).lower()) for code in codes)
+        return [self._row(idx) for idx in sorted({idx for idx in found if idx is not None})]
+
+    def _row(self, idx: int) -> dict:
+        return dict(zip(_FIELDS, self._rows[idx]))
+
+    def _code_prefix(self, q: str):
+        start = bisect_left(self._sorted_codes, (q, -1))
+        for i in range(start, len(self._sorted_codes)):
+            code, idx = self._sorted_codes[i]
+            if not code.startswith(q):
+                break
+            yield idx
+
+    def _word_prefix(self, q: str) -> set[int]:
+        hits: set[int] = set()
+        start = bisect_left(self._sorted_words, q)
+        for i in range(start, len(self._sorted_words)):
+            word = self._sorted_words[i]
+            if not word.startswith(q):
+                break
+            hits.update(self._words[word])
+        return hits
+
+    def _substring_candidates(self, q: str):
+        """Кандидаты на вхождение подстроки в порядке кода."""
+        if len(q) < 3:
+            yield from range(len(self._rows))
+            return
+        postings = []
+        for tg in _trigrams(q):
+            posting = self._trigrams.get(tg)
+            if posting is None:
+                return
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return
+        yield from sorted(candidates)
+
+    def _matches(self, idx: int, q: str) -> bool:
+        return q in self._codes[idx] or q in self._names[idx]
+
+    def search(self, q: str | None, limit: int = DEFAULT_LIMIT) -> list[dict]:
+        q = (q or "").strip().lower()
+        if not q:
+            return [self._row(idx) for idx in range(min(limit, len(self._rows)))]
+
+        found: list[int] = []
+        seen: set[int] = set()
+
+        def take(indexes) -> bool:
+            for idx in indexes:
+                if idx not in seen:
+                    seen.add(idx)
+                    found.append(idx)
+                    if len(found) >= limit:
+                        return True
+            return False
+
+        exact = self._by_code.get(q)
+        if exact is not None and take([exact]):
+            return [self._row(idx) for idx in found]
+
+        if take(self._code_prefix(q)):
+            return [self._row(idx) for idx in found]
+
+        need = limit - len(found)
+        if _WORD_RE.fullmatch(q):
+            word_hits = heapq.nsmallest(need, self._word_prefix(q) - seen)
+        else:
+            # Запрос из нескольких слов — проверяем кандидатов по триграммам
+            word_hits = []
+            for idx in self._substring_candidates(q):
+                if idx not in seen and _is_word_prefix(self._names[idx], q):
+                    word_hits.append(idx)
+                    if len(word_hits) >= need:
+                        break
+        if take(word_hits):
+            return [self._row(idx) for idx in found]
+
+        take(idx for idx in self._substring_candidates(q) if idx not in seen and self._matches(idx, q))
+        return [self._row(idx) for idx in found]
+
+
+def build_enstru_index(db: Session) -> EnstruSearchIndex:
+    """Читает таблицу enstru потоково и строит новый индекс."""
+    columns = [getattr(Enstru, name) for name in _FIELDS]
+    rows = [
+        tuple(row)
+        for row in db.query(*columns).order_by(Enstru.code).yield_per(5000)
+    ]
+    return EnstruSearchIndex(rows)
+
+
+_index = ReferenceIndex(build_enstru_index)
+
+
+@register_reload_hook
+def reload_enstru_index(db: Session) -> EnstruSearchIndex:
+    """Перестраивает индекс и атомарно подменяет текущий."""
+    return _index.load(db)
+
+
+def get_enstru_index(db: Session) -> EnstruSearchIndex:
+    """Возвращает индекс; строит его при первом обращении и по истечении REFERENCE_CACHE_TTL."""
+    return _index.get(db)
+
+
+def peek_enstru_index() -> EnstruSearchIndex | None:
+    """Уже построенный индекс без обращения к БД."""
+    return _index.peek()
+
+
+def search_enstru(db: Session, q: str | None, limit: int = DEFAULT_LIMIT) -> list[dict]:
+    return get_enstru_index(db).search(q, limit=limit)
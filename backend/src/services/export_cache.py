@@ -0,0 +1,114 @@
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+
+from ..database.database import ReadOnlySessionLocal
+from . import enstru_search, plan_service, reference_cache
+
+# Каталог для готовых выгрузок одобренных версий (сами версии никогда не меняются)
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", "./export_cache")
+
+_paths: dict[str, str] = {}
+_locks: dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _reference_version() -> str:
+    """
+    Версии справочников, чьи наименования попадают в выгрузку (ЕНС ТРУ, единицы измерения):
+    после загрузки справочника одобренная версия выгружается заново.
+    Берутся из кэшей в памяти (их прогревает старт приложения); сессия нужна,
+    только если кэши еще пусты.
+    """
+    index, units = enstru_search.peek_enstru_index(), reference_cache.mkei_cache.peek()
+    if index is None or units is None:
+        db = ReadOnlySessionLocal()
+        try:
+            index, units = enstru_search.get_enstru_index(db), reference_cache.mkei_cache.get(db)
+        finally:
+            db.close()
+    return hashlib.sha1(f"{index.version}:{units.version}".encode()).hexdigest()[:8]
+
+
+def _version_prefix(version_id: int) -> str:
+    return f"version-{version_id}-"
+
+
+def _key(version_id: int) -> str:
+    return f"{_version_prefix(version_id)}r{plan_service.EXCEL_FORMAT_REVISION}-{_reference_version()}"
+
+
+def _find(key: str) -> str | None:
+    path = _paths.get(key)
+    if path and os.path.exists(path):
+        return path
+    found = glob.glob(os.path.join(EXPORT_CACHE_DIR, f"{key}-*.xlsx"))
+    if found:
+        _paths[key] = found[0]
+        return found[0]
+    return None
+
+
+def _build(key: str, plan_id: int, version_id: int, version_number: int) -> str:
+    """Пишет выгрузку во временный файл и атомарно переименовывает его в итоговый."""
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=EXPORT_CACHE_DIR, prefix=f".{key}-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in plan_service.stream_plan_to_excel(plan_id, version_id, version_number):
+                digest.update(chunk)
+                f.write(chunk)
+        path = os.path.join(EXPORT_CACHE_DIR, f"{key}-{digest.hexdigest()[:16]}.xlsx")
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def _remove_stale(version_id: int, keep: str):
+    """
+    Удаляет прежние выгрузки версии (другая ревизия формата или версия справочников).
+    Файл, который еще отдается, в POSIX остается доступен открывшему его процессу.
+    """
+    prefix = _version_prefix(version_id)
+    for path in glob.glob(os.path.join(EXPORT_CACHE_DIR, f"{prefix}*.xlsx")):
+        if path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    for key in [key for key in _paths if key.startswith(prefix) and _paths[key] != keep]:
+        _paths.pop(key, None)
+
+
+def get_approved_export(plan_id: int, version_id: int, version_number: int) -> tuple[str, str]:
+    """
+    Возвращает (путь к файлу, ETag) выгрузки одобренной версии.
+    Имя файла (и ETag) содержит хэш содержимого: части архива пишутся с фиксированной
+    датой, поэтому одна и та же версия во всех воркерах дает один ETag.
+    Параллельные запросы ждут одну сборку.
+    """
+    key = _key(version_id)
+    path = _find(key)
+    if path is None:
+        with _locks_guard:
+            lock = _locks.setdefault(key, threading.Lock())
+        try:
+            with lock:
+                path = _find(key)
+                if path is None:
+                    path = _build(key, plan_id, version_id, version_number)
+                    _paths[key] = path
+                    _remove_stale(version_id, keep=path)
+        finally:
+            # Блокировка нужна только на время сборки; ждущие потоки держат ссылку на нее сами
+            with _locks_guard:
+                if _locks.get(key) is lock:
+                    del _locks[key]
+    etag = '"' + os.path.basename(path)[:-len(".xlsx")] + '"'
+    return path, etag
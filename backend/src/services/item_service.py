@@ -4,7 +4,8 @@ from decimal import Decimal
 from fastapi import HTTPException, status
 from ..models import models
 from ..schemas import plan as plan_schema
-from .plan_service import _recalculate_version_metrics
+from . import analytics_service
+from .plan_service import _apply_version_delta, _item_amounts
 
 def get_item(db: Session, item_id: int) -> models.PlanItemVersion | None:
     """Получает конкретную позицию плана по ее ID, если она не удалена."""
@@ -29,6 +30,9 @@ def update_item(db: Session, item_id: int, item_in: plan_schema.PlanItemUpdate,
     if plan.created_by != user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Нет прав для редактирования этой позиции.")
 
+    old_total, old_ktp = _item_amounts(db_item)
+    rollup_deltas = analytics_service.collect_deltas([db_item], sign=-1)
+
     update_data = item_in.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_item, key, value)
@@ -43,8 +47,11 @@ def update_item(db: Session, item_id: int, item_in: plan_schema.PlanItemUpdate,
         else:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Код ЕНС ТРУ '{update_data['trucode']}' не найден.")
 
+    new_total, new_ktp = _item_amounts(db_item)
+    _apply_version_delta(db, version.id, new_total - old_total, new_ktp - old_ktp)
+    analytics_service.apply_deltas(db, version.id, analytics_service.collect_deltas([db_item], deltas=rollup_deltas))
+
     db.commit()
-    _recalculate_version_metrics(db, version.id)
     db.refresh(db_item)
     return db_item
 
@@ -65,9 +72,10 @@ def delete_item(db: Session, item_id: int, user: models.User) -> bool:
     if plan.created_by != user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Нет прав для удаления этой позиции.")
 
+    old_total, old_ktp = _item_amounts(db_item)
+    analytics_service.apply_deltas(db, version.id, analytics_service.collect_deltas([db_item], sign=-1))
     db_item.is_deleted = True
+    _apply_version_delta(db, version.id, -old_total, -old_ktp)
     db.commit()
-    
-    _recalculate_version_metrics(db, version.id)
-    
+
     return True
@@ -1,65 +1,114 @@
+from collections import defaultdict
+
 from sqlalchemy.orm import Session
 from ..models.models import Kato
+from .reference_cache import ReferenceIndex, register_reload_hook
+
+_FIELDS = ("id", "parent_id", "code", "name_kz", "name_ru")
+
+
+class KatoTree:
+    """
+    Дерево KATO, построенное одним запросом к таблице kato.
+
+    Хранит узлы, список детей для каждого родителя и глубину узла,
+    поэтому эндпоинты /kato/* не обращаются к БД.
+    """
+
+    def __init__(self, rows: list[tuple]):
+        self.nodes: dict[int, tuple] = {}
+        self.children: dict[int | None, list[int]] = defaultdict(list)
+        self.depth: dict[int, int] = {}
+        self._paths: dict[int, tuple[int, ...]] = {}
+
+        for row in rows:
+            self.nodes[row[0]] = row
+            self.children[row[1]].append(row[0])
+
+        # Корни — узлы, чей родитель отсутствует в справочнике (0 или NULL)
+        stack = [(node_id, 0) for node_id, row in self.nodes.items() if row[1] not in self.nodes]
+        while stack:
+            node_id, depth = stack.pop()
+            if node_id in self.depth:
+                continue
+            self.depth[node_id] = depth
+            stack.extend((child_id, depth + 1) for child_id in self.children.get(node_id, ()))
+
+    def child_count(self, kato_id: int) -> int:
+        return len(self.children.get(kato_id, ()))
+
+    def path(self, kato_id: int) -> tuple[int, ...]:
+        """ID узлов от корня до kato_id включительно; пути запоминаются."""
+        path = self._paths.get(kato_id)
+        if path is not None:
+            return path
+        node = self.nodes.get(kato_id)
+        if node is None:
+            return ()
+        parent_id = node[1]
+        if parent_id in self.nodes and self.depth.get(kato_id, 0) > 0:
+            path = self.path(parent_id) + (kato_id,)
+        else:
+            path = (kato_id,)
+        self._paths[kato_id] = path
+        return path
+
+    def as_dict(self, kato_id: int) -> dict:
+        node = dict(zip(_FIELDS, self.nodes[kato_id]))
+        node["has_children"] = self.child_count(kato_id) > 0
+        return node
+
+
+def build_kato_tree(db: Session) -> KatoTree:
+    columns = [getattr(Kato, name) for name in _FIELDS]
+    return KatoTree([tuple(row) for row in db.query(*columns).order_by(Kato.id).yield_per(5000)])
+
+
+_tree = ReferenceIndex(build_kato_tree)
+
+
+@register_reload_hook
+def reload_kato_tree(db: Session) -> KatoTree:
+    """Перестраивает дерево и атомарно подменяет текущее."""
+    return _tree.load(db)
+
+
+def get_kato_tree(db: Session) -> KatoTree:
+    """Возвращает дерево KATO; строит его при первом обращении и по истечении REFERENCE_CACHE_TTL."""
+    return _tree.get(db)
+
 
 def get_kato_children(db: Session, parent_id: int | None = 0):
     """
-    Получает дочерние элементы KATO и для каждого из них определяет,
-    есть ли у него свои дочерние элементы.
+    Получает дочерние элементы KATO вместе с признаком наличия у них детей.
     """
-    # Сначала получаем все дочерние элементы для указанного родителя
-    kato_items = db.query(Kato).filter(Kato.parent_id == parent_id).all()
-
-    results = []
-    for item in kato_items:
-        # Для каждого элемента делаем простой запрос, чтобы проверить наличие его детей
-        has_children = db.query(Kato.id).filter(Kato.parent_id == item.id).first() is not None
-        results.append({
-            "id": item.id,
-            "parent_id": item.parent_id,
-            "code": item.code,
-            "name_kz": item.name_kz,
-            "name_ru": item.name_ru,
-            "has_children": has_children,
-        })
-    return results
+    tree = get_kato_tree(db)
+    return [tree.as_dict(child_id) for child_id in tree.children.get(parent_id, ())]
 
 def get_kato_by_id(db: Session, kato_id: int):
     """
     Получает один элемент KATO по его ID и определяет, есть ли у него дочерние элементы.
     """
-    kato_item = db.query(Kato).filter(Kato.id == kato_id).first()
-    if not kato_item:
+    tree = get_kato_tree(db)
+    if kato_id not in tree.nodes:
         return None
-    
-    has_children = db.query(Kato.id).filter(Kato.parent_id == kato_item.id).first() is not None
-    
-    return {
-        "id": kato_item.id,
-        "parent_id": kato_item.parent_id,
-        "code": kato_item.code,
-        "name_kz": kato_item.name_kz,
-        "name_ru": kato_item.name_ru,
-        "has_children": has_children,
-    }
+    return tree.as_dict(kato_id)
 
 def get_kato_parents(db: Session, kato_id: int):
     """
     Получает всех родительских элементов для указанного KATO.
     """
-    parents = []
-    # Используем get() для безопасного доступа к ключам словаря
-    current_kato_dict = get_kato_by_id(db, kato_id)
-    
-    # Проверяем, что parent_id существует и не равен 0
-    while current_kato_dict and current_kato_dict.get('parent_id'):
-        parent_id = current_kato_dict.get('parent_id')
-        if not parent_id:
-            break
-        
-        parent_dict = get_kato_by_id(db, parent_id)
-        if parent_dict:
-            parents.insert(0, parent_dict)
-            current_kato_dict = parent_dict
-        else:
-            break
-    return parents
+    tree = get_kato_tree(db)
+    return [tree.as_dict(node_id) for node_id in tree.path(kato_id)[:-1]]
+
+def get_kato_paths(db: Session, kato_ids: list[int]) -> list[dict]:
+    """
+    Пакетный вариант: для каждого KATO возвращает путь от корня до него самого.
+    Неизвестные ID пропускаются.
+    """
+    tree = get_kato_tree(db)
+    return [
+        {"id": kato_id, "path": [tree.as_dict(node_id) for node_id in tree.path(kato_id)]}
+        for kato_id in dict.fromkeys(kato_ids)
+        if kato_id in tree.nodes
+    ]
@@ -0,0 +1,40 @@
+from sqlalchemy.orm import Session
+from ..models.models import Reestr_KTP
+from .reference_cache import ReferenceIndex, register_reload_hook
+
+# Коды ЕНС ТРУ из реестра КТП хранятся в памяти множеством: проверка позиции —
+# поиск в хэш-таблице без обращения к БД. Даже сотни тысяч записей реестра
+# занимают единицы мегабайт, поэтому фильтр Блума здесь не нужен.
+
+
+def _normalize(code: str) -> str:
+    return str(code).strip()
+
+
+def build_ktp_codes(db: Session) -> frozenset[str]:
+    rows = db.query(Reestr_KTP.ens_tru_code).distinct().yield_per(10000)
+    return frozenset(_normalize(code) for (code,) in rows if code)
+
+
+_codes = ReferenceIndex(build_ktp_codes)
+
+
+@register_reload_hook
+def reload_ktp_codes(db: Session) -> frozenset[str]:
+    """Перечитывает реестр и атомарно подменяет текущее множество кодов."""
+    return _codes.load(db)
+
+
+def get_ktp_codes(db: Session) -> frozenset[str]:
+    """Множество кодов реестра КТП; загружается при первом обращении и по истечении REFERENCE_CACHE_TTL."""
+    return _codes.get(db)
+
+
+def is_ktp(db: Session, enstru_code: str) -> bool:
+    return _normalize(enstru_code) in get_ktp_codes(db)
+
+
+def check_codes(db: Session, enstru_codes: list[str]) -> dict[str, bool]:
+    """Статус КТП для каждого переданного кода (повторы схлопываются)."""
+    codes = get_ktp_codes(db)
+    return {code: _normalize(code) in codes for code in dict.fromkeys(enstru_codes)}
@@ -1,11 +1,25 @@
-from sqlalchemy.orm import Session, joinedload, selectinload
-from sqlalchemy import func, desc, and_
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import func, desc, and_, or_, insert, case, select, literal
 from decimal import Decimal
+import base64
+import json
+import os
 from fastapi import HTTPException, status
-import io
-import openpyxl
+from pydantic import ValidationError
+from ..database.database import ReadOnlySessionLocal
 from ..models import models
 from ..schemas import plan as plan_schema
+from ..utils.cache import LRUCache
+from . import analytics_service, enstru_search, kato_service, ktp_registry, reference_cache
+from ..utils.table_reader import cell_text, iter_table
+from ..utils.xlsx_stream import stream_xlsx
+
+# plan_id -> created_by. Владелец плана не меняется, но после удаления плана его id
+# может достаться новому плану (SQLite переиспользует максимальный rowid), а удаление
+# сбрасывает запись только в своем воркере. Поэтому запись живет не дольше TTL.
+PLAN_OWNER_CACHE_TTL = int(os.getenv("PLAN_OWNER_CACHE_TTL", "60"))
+_plan_owner_cache = LRUCache(maxsize=10000, ttl=PLAN_OWNER_CACHE_TTL)
 
 # ========= Вспомогательные функции для версий =========
 
@@ -19,24 +33,54 @@ def _get_active_version(db: Session, plan_id: int, lock: bool = False) -> models
         query = query.with_for_update()
     return query.first()
 
+def _item_amounts(item: models.PlanItemVersion | None) -> tuple[Decimal, Decimal]:
+    """(сумма, сумма КТП) позиции — вклад позиции в метрики версии."""
+    if item is None or item.is_deleted:
+        return Decimal('0.00'), Decimal('0.00')
+    total = Decimal(item.total_amount or 0)
+    return total, (total if item.is_ktp else Decimal('0.00'))
+
+def _apply_version_delta(db: Session, version_id: int, total_delta: Decimal, ktp_delta: Decimal):
+    """
+    Инкрементально обновляет метрики версии на изменение сумм ее позиций.
+    Выполняется одним UPDATE в текущей транзакции, коммит остается за вызывающим.
+    """
+    if not total_delta and not ktp_delta:
+        return
+
+    version = models.ProcurementPlanVersion
+    total_amount = func.coalesce(version.total_amount, 0) + total_delta
+    ktp_amount = func.coalesce(version.ktp_amount, 0) + ktp_delta
+    ktp_percentage = case((total_amount > 0, ktp_amount * 100 / total_amount), else_=0)
+    import_percentage = case((total_amount > 0, 100 - ktp_amount * 100 / total_amount), else_=0)
+
+    db.query(version).filter(version.id == version_id).update({
+        version.total_amount: total_amount,
+        version.ktp_amount: ktp_amount,
+        version.ktp_percentage: ktp_percentage,
+        version.import_percentage: import_percentage,
+    }, synchronize_session=False)
+
 def _recalculate_version_metrics(db: Session, version_id: int):
-    """Пересчитывает общую сумму и другие метрики для конкретной версии плана."""
+    """
+    Полностью пересчитывает общую сумму и другие метрики версии по ее позициям.
+    В обычной работе метрики ведутся инкрементально (_apply_version_delta),
+    этот пересчет — явная проверка согласованности.
+    """
     version = db.query(models.ProcurementPlanVersion).filter(models.ProcurementPlanVersion.id == version_id).first()
     if not version:
         return
 
-    total_amount_res = db.query(func.sum(models.PlanItemVersion.total_amount)).filter(
-        models.PlanItemVersion.version_id == version_id,
-        models.PlanItemVersion.is_deleted == False
-    ).first()
-    ktp_amount_res = db.query(func.sum(models.PlanItemVersion.total_amount)).filter(
+    total_amount, ktp_amount = db.query(
+        func.sum(models.PlanItemVersion.total_amount),
+        func.sum(case((models.PlanItemVersion.is_ktp == True, models.PlanItemVersion.total_amount), else_=0)),
+    ).filter(
         models.PlanItemVersion.version_id == version_id,
-        models.PlanItemVersion.is_ktp == True,
         models.PlanItemVersion.is_deleted == False
-    ).first()
+    ).one()
 
-    total_amount = total_amount_res[0] if total_amount_res[0] is not None else Decimal('0.00')
-    ktp_amount = ktp_amount_res[0] if ktp_amount_res[0] is not None else Decimal('0.00')
+    total_amount = Decimal(total_amount) if total_amount is not None else Decimal('0.00')
+    ktp_amount = Decimal(ktp_amount) if ktp_amount is not None else Decimal('0.00')
 
     if total_amount > 0:
         ktp_percentage = (ktp_amount / total_amount * 100)
@@ -46,10 +90,13 @@ def _recalculate_version_metrics(db: Session, version_id: int):
         import_percentage = Decimal('0.00')
 
     version.total_amount = total_amount
+    version.ktp_amount = ktp_amount
     version.ktp_percentage = ktp_percentage
     version.import_percentage = import_percentage
+    analytics_service.rebuild_version_rollup(db, version_id)
     db.commit()
     db.refresh(version)
+    return version
 
 # ========= Сервисы для Смет Закупок (ProcurementPlan) =========
 
@@ -72,31 +119,250 @@ def create_plan(db: Session, plan_in: plan_schema.ProcurementPlanCreate, user: m
     db.add(initial_version)
     db.commit()
     db.refresh(db_plan)
+    # Перезаписываем возможную запись удаленного плана с тем же id
+    _plan_owner_cache.set(db_plan.id, user.id)
     return db_plan
 
-def get_plan_with_active_version(db: Session, plan_id: int) -> models.ProcurementPlan | None:
-    return db.query(models.ProcurementPlan).options(
-        selectinload(models.ProcurementPlan.versions)
-        .selectinload(models.ProcurementPlanVersion.items)
-        .options(
-            joinedload(models.PlanItemVersion.enstru),
-            joinedload(models.PlanItemVersion.unit),
-            joinedload(models.PlanItemVersion.expense_item),
-            joinedload(models.PlanItemVersion.funding_source),
-            joinedload(models.PlanItemVersion.agsk),
-            joinedload(models.PlanItemVersion.kato_purchase),
-            joinedload(models.PlanItemVersion.kato_delivery)
-        )
+def get_plan_owner_id(db: Session, plan_id: int) -> int | None:
+    """ID владельца плана: один скалярный запрос по первичному ключу, результат кэшируется."""
+    owner_id = _plan_owner_cache.get(plan_id)
+    if owner_id is None:
+        owner_id = db.query(models.ProcurementPlan.created_by).filter(
+            models.ProcurementPlan.id == plan_id
+        ).scalar()
+        if owner_id is not None:
+            _plan_owner_cache.set(plan_id, owner_id)
+    return owner_id
+
+def _item_lookups_options():
+    return (
+        joinedload(models.PlanItemVersion.enstru),
+        joinedload(models.PlanItemVersion.unit),
+        joinedload(models.PlanItemVersion.expense_item),
+        joinedload(models.PlanItemVersion.funding_source),
+        joinedload(models.PlanItemVersion.agsk),
+        joinedload(models.PlanItemVersion.kato_purchase),
+        joinedload(models.PlanItemVersion.kato_delivery)
+    )
+
+def get_plan_with_active_version(db: Session, plan_id: int, with_lookups: bool = True) -> models.ProcurementPlan | None:
+    """
+    Загружает план со списком версий; позиции загружаются только для активной версии.
+    with_lookups=False — без справочников (для компактного представления).
+    """
+    plan = db.query(models.ProcurementPlan).options(
+        selectinload(models.ProcurementPlan.versions).joinedload(models.ProcurementPlanVersion.creator)
     ).filter(
         models.ProcurementPlan.id == plan_id
     ).first()
-
-def get_plans_by_user(db: Session, user: models.User, skip: int = 0, limit: int = 100) -> list[models.ProcurementPlan]:
-    return db.query(models.ProcurementPlan).options(
-        selectinload(models.ProcurementPlan.versions).selectinload(models.ProcurementPlanVersion.creator)
+    if plan is None:
+        return None
+
+    active_version = plan.active_version
+    if active_version is not None:
+        query = db.query(models.PlanItemVersion)
+        if with_lookups:
+            query = query.options(*_item_lookups_options())
+        items = query.filter(
+            models.PlanItemVersion.version_id == active_version.id
+        ).order_by(models.PlanItemVersion.item_number).all()
+        set_committed_value(active_version, "items", items)
+    return plan
+
+def get_plan_compact(db: Session, plan_id: int) -> dict:
+    """План для view=compact: позиции без вложенных объектов и общий список справочников."""
+    db_plan = get_plan_with_active_version(db, plan_id=plan_id, with_lookups=False)
+    active_version = db_plan.active_version
+    items = active_version.items if active_version else []
+    return {
+        "id": db_plan.id,
+        "plan_name": db_plan.plan_name,
+        "year": db_plan.year,
+        "created_by": db_plan.created_by,
+        "created_at": db_plan.created_at,
+        "active_version": active_version,
+        "versions": db_plan.versions,
+        "lookups": collect_item_lookups(db, items),
+    }
+
+
+def collect_item_lookups(db: Session, items: list[models.PlanItemVersion]) -> dict:
+    """
+    Собирает справочные записи, на которые ссылаются позиции, без повторов.
+    Большая часть берется из кэшей в памяти; в БД идет только запрос по АГСК.
+    """
+    def distinct(*fields):
+        return {getattr(item, f) for item in items for f in fields} - {None}
+
+    def pick(table: reference_cache.ReferenceTable, ids: set) -> list[dict]:
+        return [row for row in table.get(db).rows if row["id"] in ids]
+
+    agsk_codes = distinct("agsk_id")
+    kato_tree = kato_service.get_kato_tree(db)
+    return {
+        "enstru": enstru_search.get_enstru_index(db).get_many(distinct("trucode")),
+        "mkei": pick(reference_cache.mkei_cache, distinct("unit_id")),
+        "cost_items": pick(reference_cache.cost_item_cache, distinct("expense_item_id")),
+        "source_funding": pick(reference_cache.source_funding_cache, distinct("funding_source_id")),
+        "agsk": db.query(models.Agsk).filter(models.Agsk.code.in_(agsk_codes)).all() if agsk_codes else [],
+        "kato": [
+            kato_tree.as_dict(kato_id)
+            for kato_id in sorted(distinct("kato_purchase_id", "kato_delivery_id"))
+            if kato_id in kato_tree.nodes
+        ],
+    }
+
+ITEM_SORT_COLUMNS = {
+    "item_number": models.PlanItemVersion.item_number,
+    "total_amount": models.PlanItemVersion.total_amount,
+    "price_per_unit": models.PlanItemVersion.price_per_unit,
+    "quantity": models.PlanItemVersion.quantity,
+    "trucode": models.PlanItemVersion.trucode,
+}
+
+def _encode_cursor(value, item_number: int) -> str:
+    raw = json.dumps([None if value is None else str(value), item_number])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str, sort: str):
+    try:
+        value, item_number = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort in ("total_amount", "price_per_unit", "quantity"):
+            value = Decimal(value)
+        elif sort == "item_number":
+            value = int(value)
+        return value, int(item_number)
+    except (ValueError, TypeError, ArithmeticError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный курсор")
+
+def _filter_version_items(query, version_id: int, filters: plan_schema.PlanItemFilter):
+    item = models.PlanItemVersion
+    query = query.filter(item.version_id == version_id)
+    if not filters.include_deleted:
+        query = query.filter(item.is_deleted == False)
+    if filters.need_type is not None:
+        query = query.filter(item.need_type == filters.need_type)
+    if filters.is_ktp is not None:
+        query = query.filter(item.is_ktp == filters.is_ktp)
+    if filters.expense_item_id is not None:
+        query = query.filter(item.expense_item_id == filters.expense_item_id)
+    if filters.funding_source_id is not None:
+        query = query.filter(item.funding_source_id == filters.funding_source_id)
+    if filters.trucode:
+        query = query.filter(item.trucode.ilike(f"%{filters.trucode}%"))
+    return query
+
+def get_version_items_page(
+    db: Session,
+    plan_id: int,
+    version_id: int,
+    filters: plan_schema.PlanItemFilter,
+    sort: str = "item_number",
+    order: str = "asc",
+    cursor: str | None = None,
+    limit: int = 100,
+    with_lookups: bool = True,
+) -> dict:
+    """
+    Постраничная выдача позиций любой версии плана с фильтрами.
+    Пагинация keyset по (поле сортировки, item_number), поэтому глубокие
+    страницы стоят столько же, сколько первая.
+    """
+    version = db.query(models.ProcurementPlanVersion.id).filter(
+        models.ProcurementPlanVersion.id == version_id,
+        models.ProcurementPlanVersion.plan_id == plan_id
+    ).first()
+    if not version:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Версия сметы не найдена")
+
+    item = models.PlanItemVersion
+    sort_column = ITEM_SORT_COLUMNS[sort]
+    descending = order == "desc"
+
+    total = _filter_version_items(db.query(func.count(item.id)), version_id, filters).scalar()
+
+    query = db.query(item).options(*_item_lookups_options()) if with_lookups else db.query(item)
+    query = _filter_version_items(query, version_id, filters)
+    if cursor:
+        value, item_number = _decode_cursor(cursor, sort)
+        if sort == "item_number":
+            query = query.filter(item.item_number < item_number if descending else item.item_number > item_number)
+        elif descending:
+            query = query.filter(or_(sort_column < value, and_(sort_column == value, item.item_number < item_number)))
+        else:
+            query = query.filter(or_(sort_column > value, and_(sort_column == value, item.item_number > item_number)))
+
+    order_columns = [item.item_number] if sort == "item_number" else [sort_column, item.item_number]
+    query = query.order_by(*[c.desc() if descending else c.asc() for c in order_columns])
+
+    items = query.limit(limit + 1).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = None
+    if has_more:
+        last = items[-1]
+        next_cursor = _encode_cursor(getattr(last, sort), last.item_number)
+    return {"items": items, "total": total, "next_cursor": next_cursor}
+
+PLAN_PAGE_LIMIT = 50
+
+
+def get_plan_summaries(
+    db: Session,
+    user: models.User,
+    year: int | None = None,
+    plan_status: models.PlanStatus | None = None,
+    cursor: int | None = None,
+    limit: int = PLAN_PAGE_LIMIT,
+) -> dict:
+    """
+    Список планов пользователя одним агрегирующим запросом: поля активной версии
+    и сводка по всем версиям. Пагинация по ключу (id < cursor), поэтому дальние
+    страницы стоят столько же, сколько первая.
+    """
+    Plan, Version = models.ProcurementPlan, models.ProcurementPlanVersion
+    active = aliased(Version)
+    approved = case((Version.status.in_([models.PlanStatus.PRE_APPROVED, models.PlanStatus.APPROVED]), 1), else_=0)
+
+    query = db.query(
+        Plan.id, Plan.plan_name, Plan.year, Plan.created_by, Plan.created_at,
+        active.id.label("active_version_id"),
+        active.version_number.label("active_version_number"),
+        active.status.label("status"),
+        active.total_amount.label("total_amount"),
+        active.ktp_percentage.label("ktp_percentage"),
+        func.count(Version.id).label("versions_count"),
+        func.coalesce(func.max(approved), 0).label("has_approved_versions"),
+    ).outerjoin(
+        active, and_(active.plan_id == Plan.id, active.is_active == True)
+    ).outerjoin(
+        Version, Version.plan_id == Plan.id
+    ).filter(Plan.created_by == user.id)
+
+    if year is not None:
+        query = query.filter(Plan.year == year)
+    if plan_status is not None:
+        query = query.filter(active.status == plan_status)
+    if cursor is not None:
+        query = query.filter(Plan.id < cursor)
+
+    rows = query.group_by(Plan.id, active.id).order_by(desc(Plan.id)).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].id
+    items = [{**row._asdict(), "has_approved_versions": bool(row.has_approved_versions)} for row in rows]
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def get_plan_versions(db: Session, plan_id: int) -> list[models.ProcurementPlanVersion]:
+    """Версии плана (без позиций) для истории версий."""
+    return db.query(models.ProcurementPlanVersion).options(
+        joinedload(models.ProcurementPlanVersion.creator)
     ).filter(
-        models.ProcurementPlan.created_by == user.id
-    ).order_by(desc(models.ProcurementPlan.id)).offset(skip).limit(limit).all()
+        models.ProcurementPlanVersion.plan_id == plan_id
+    ).order_by(models.ProcurementPlanVersion.version_number).all()
 
 
 def update_plan_status(db: Session, plan_id: int, new_status: models.PlanStatus, user: models.User) -> models.ProcurementPlanVersion:
@@ -110,6 +376,8 @@ def update_plan_status(db: Session, plan_id: int, new_status: models.PlanStatus,
         active_version.status = new_status
     elif current_status == models.PlanStatus.PRE_APPROVED and new_status == models.PlanStatus.APPROVED:
         active_version.status = new_status
+        # Одобренная версия попадает в отчеты: ее сводка пересобирается по позициям
+        analytics_service.rebuild_version_rollup(db, active_version.id)
     elif current_status == new_status:
         pass
     else:
@@ -122,15 +390,20 @@ def update_plan_status(db: Session, plan_id: int, new_status: models.PlanStatus,
     db.refresh(active_version)
     return active_version
 
+def recalculate_version(db: Session, plan_id: int, version_id: int) -> models.ProcurementPlanVersion:
+    """Явная проверка согласованности: полный пересчет метрик версии по позициям."""
+    version = db.query(models.ProcurementPlanVersion).filter(
+        models.ProcurementPlanVersion.id == version_id,
+        models.ProcurementPlanVersion.plan_id == plan_id
+    ).first()
+    if not version:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Версия сметы не найдена")
+    return _recalculate_version_metrics(db, version.id)
+
 def create_new_version_for_editing(db: Session, plan_id: int, user: models.User) -> models.ProcurementPlanVersion:
     db.begin_nested()
     try:
-        current_active_version = db.query(models.ProcurementPlanVersion).filter(
-            models.ProcurementPlanVersion.plan_id == plan_id,
-            models.ProcurementPlanVersion.is_active == True
-        ).options(
-            selectinload(models.ProcurementPlanVersion.items)
-        ).with_for_update().first()
+        current_active_version = _get_active_version(db, plan_id, lock=True)
 
         if not current_active_version:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Активная версия не найдена.")
@@ -149,25 +422,27 @@ def create_new_version_for_editing(db: Session, plan_id: int, user: models.User)
             is_active=True,
             created_by=user.id,
             total_amount=current_active_version.total_amount,
+            ktp_amount=current_active_version.ktp_amount,
             ktp_percentage=current_active_version.ktp_percentage,
             import_percentage=current_active_version.import_percentage
         )
         db.add(new_version)
         db.flush()
 
-        new_items = []
-        for item in current_active_version.items:
-            if not item.is_deleted:
-                new_item_data = {
-                    key: getattr(item, key)
-                    for key in item.__table__.columns.keys()
-                    if key not in ['id', 'version_id']
-                }
-                new_item_data['version_id'] = new_version.id
-                new_items.append(models.PlanItemVersion(**new_item_data))
-
-        if new_items:
-            db.bulk_save_objects(new_items)
+        # Копируем позиции одним INSERT ... SELECT на стороне БД, без загрузки в ORM
+        item = models.PlanItemVersion
+        copied_columns = [c for c in item.__table__.columns.keys() if c not in ('id', 'version_id')]
+        source = select(
+            *[getattr(item, c) for c in copied_columns],
+            literal(new_version.id).label('version_id')
+        ).where(
+            item.version_id == current_active_version.id,
+            item.is_deleted == False
+        )
+        db.execute(
+            insert(item.__table__).from_select(copied_columns + ['version_id'], source)
+        )
+        analytics_service.copy_version_rollup(db, current_active_version.id, new_version.id)
 
         db.commit()
         db.refresh(new_version)
@@ -200,6 +475,7 @@ def delete_latest_version(db: Session, plan_id: int, user: models.User):
         db.query(models.PlanItemVersion).filter(
             models.PlanItemVersion.version_id == active_version.id
         ).delete(synchronize_session=False)
+        analytics_service.delete_rollups(db, version_id=active_version.id)
 
         db.delete(active_version)
 
@@ -227,8 +503,10 @@ def delete_plan(db: Session, plan_id: int):
     if has_approved_version:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Нельзя удалить план, который уже был одобрен.")
 
+    analytics_service.delete_rollups(db, plan_id=plan_id)
     db.delete(plan_to_delete)
     db.commit()
+    _plan_owner_cache.pop(plan_id)
     return True
 
 # ========= Сервисы для Позиций Плана (PlanItemVersion) =========
@@ -244,11 +522,7 @@ def add_item_to_plan(db: Session, plan_id: int, item_in: plan_schema.PlanItemCre
     if not enstru_item:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Код ЕНС ТРУ не найден")
 
-    last_item = db.query(models.PlanItemVersion).filter(
-        models.PlanItemVersion.version_id == active_version.id,
-        models.PlanItemVersion.is_deleted == False
-    ).order_by(desc(models.PlanItemVersion.item_number)).first()
-    item_number = (last_item.item_number + 1) if last_item else 1
+    item_number = _next_item_number(db, active_version.id)
 
     total_amount = item_in.quantity * item_in.price_per_unit
 
@@ -260,55 +534,419 @@ def add_item_to_plan(db: Session, plan_id: int, item_in: plan_schema.PlanItemCre
         need_type=models.NeedType(enstru_item.type_ru)
     )
     db.add(db_item)
+    _apply_version_delta(db, active_version.id, *_item_amounts(db_item))
+    analytics_service.apply_deltas(db, active_version.id, analytics_service.collect_deltas([db_item]))
     db.commit()
 
-    _recalculate_version_metrics(db, active_version.id)
-
     db.refresh(db_item)
     return db_item
 
-def export_plan_to_excel(db: Session, plan_id: int, version_id: int = None) -> bytes:
+def _next_item_number(db: Session, version_id: int) -> int:
+    """
+    Следующий свободный номер позиции. Учитываются и удаленные позиции,
+    так как уникальность (version_id, item_number) действует и на них.
+    """
+    last_number = db.query(func.max(models.PlanItemVersion.item_number)).filter(
+        models.PlanItemVersion.version_id == version_id
+    ).scalar()
+    return (last_number or 0) + 1
+
+def _existing_keys(db: Session, column, values) -> set:
+    """Какие из значений присутствуют в справочнике — одним запросом."""
+    values = {v for v in values if v is not None}
+    if not values:
+        return set()
+    return {row[0] for row in db.query(column).filter(column.in_(values))}
+
+def _reference_errors(db: Session, items_in: list[plan_schema.PlanItemCreate]) -> tuple[dict[str, str], list[dict]]:
+    """
+    Проверяет ссылки набора позиций на справочники по ключам в памяти: индекс ЕНС ТРУ,
+    кэши справочников и дерево KATO; АГСК — одним запросом по кодам из набора.
+    Значения, которых нет в памяти, перепроверяются в БД: структуры в памяти могут
+    отставать от загруженного справочника на REFERENCE_CACHE_TTL.
+    Возвращает тип ЕНС ТРУ по коду (для need_type) и ошибки с индексом позиции.
+    """
+    trucodes = {item.trucode for item in items_in}
+    enstru_types = {
+        row["code"]: row["type_ru"]
+        for row in enstru_search.get_enstru_index(db).get_many(trucodes)
+    }
+    missing_codes = trucodes - enstru_types.keys()
+    if missing_codes:
+        enstru_types.update(db.query(models.Enstru.code, models.Enstru.type_ru).filter(models.Enstru.code.in_(missing_codes)))
+
+    kato_nodes = kato_service.get_kato_tree(db).nodes
+    known = {
+        "unit_id": {row["id"] for row in reference_cache.mkei_cache.get(db).rows},
+        "expense_item_id": {row["id"] for row in reference_cache.cost_item_cache.get(db).rows},
+        "funding_source_id": {row["id"] for row in reference_cache.source_funding_cache.get(db).rows},
+        "agsk_id": _existing_keys(db, models.Agsk.code, (item.agsk_id for item in items_in)),
+        "kato_purchase_id": kato_nodes,
+        "kato_delivery_id": kato_nodes,
+    }
+    db_columns = {
+        "unit_id": models.Mkei.id,
+        "expense_item_id": models.Cost_Item.id,
+        "funding_source_id": models.Source_Funding.id,
+        "kato_purchase_id": models.Kato.id,
+        "kato_delivery_id": models.Kato.id,
+    }
+    for field, column in db_columns.items():
+        found = _existing_keys(db, column, (getattr(item, field) for item in items_in if getattr(item, field) not in known[field]))
+        if found:
+            known[field] = {*known[field], *found}
+
+    errors = []
+    for index, item in enumerate(items_in):
+        if item.trucode not in enstru_types:
+            errors.append({"index": index, "field": "trucode", "value": item.trucode})
+        for field, keys in known.items():
+            value = getattr(item, field)
+            if value is not None and value not in keys:
+                errors.append({"index": index, "field": field, "value": value})
+    return enstru_types, errors
+
+def _validate_item_references(db: Session, items_in: list[plan_schema.PlanItemCreate]) -> dict[str, str]:
+    """То же, что _reference_errors, но при любой ошибке отклоняет весь набор."""
+    enstru_types, errors = _reference_errors(db, items_in)
+    if errors:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "Ссылки на справочники не найдены", "errors": errors}
+        )
+    return enstru_types
+
+def _get_draft_version_for_items(db: Session, plan_id: int) -> models.ProcurementPlanVersion:
+    active_version = _get_active_version(db, plan_id, lock=True)
+    if not active_version:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Активная версия плана не найдена")
+    if active_version.status != models.PlanStatus.DRAFT:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Добавлять позиции можно только в черновик.")
+    return active_version
+
+def _insert_items(
+    db: Session,
+    active_version: models.ProcurementPlanVersion,
+    items_in: list[plan_schema.PlanItemCreate],
+    enstru_types: dict[str, str],
+) -> dict:
+    """Один executemany по всем позициям, один пересчет метрик и сводки версии, затем commit."""
+    first_number = _next_item_number(db, active_version.id)
+    rows = [
+        {
+            **item.model_dump(),
+            "version_id": active_version.id,
+            "item_number": first_number + offset,
+            "total_amount": item.quantity * item.price_per_unit,
+            "need_type": models.NeedType(enstru_types[item.trucode]),
+        }
+        for offset, item in enumerate(items_in)
+    ]
+    db.execute(insert(models.PlanItemVersion), rows)
+    _apply_version_delta(
+        db, active_version.id,
+        sum((row["total_amount"] for row in rows), Decimal('0.00')),
+        sum((row["total_amount"] for row in rows if row["is_ktp"]), Decimal('0.00')),
+    )
+    analytics_service.apply_deltas(db, active_version.id, analytics_service.collect_deltas(rows))
+    db.commit()
+    db.refresh(active_version)
+
+    return {
+        "created": len(rows),
+        "first_item_number": first_number,
+        "last_item_number": first_number + len(rows) - 1,
+        "version": active_version,
+    }
+
+def add_items_to_plan_bulk(db: Session, plan_id: int, items_in: list[plan_schema.PlanItemCreate], user: models.User) -> dict:
+    """
+    Пакетное добавление позиций в активную версию: проверка справочников
+    по ключам в памяти, один executemany и один пересчет метрик.
+    """
+    active_version = _get_draft_version_for_items(db, plan_id)
+    enstru_types = _validate_item_references(db, items_in)
+    return _insert_items(db, active_version, items_in, enstru_types)
+
+EXCEL_HEADERS = [
+    "№", "Код ЕНС ТРУ", "Наименование", "Ед. изм.",
+    "Кол-во", "Цена за ед.", "Общая сумма", "КТП", "Резидент",
+    "ID ед. изм.", "ID статьи затрат", "ID источника финансирования",
+    "Код АГСК", "ID КАТО закупки", "ID КАТО поставки"
+]
+# Колонки выгрузки, которые читает импорт позиций (items:import), и поля PlanItemCreate
+EXCEL_IMPORT_COLUMNS = {
+    "Код ЕНС ТРУ": "trucode",
+    "Кол-во": "quantity",
+    "Цена за ед.": "price_per_unit",
+    "КТП": "is_ktp",
+    "Резидент": "is_resident",
+    "ID ед. изм.": "unit_id",
+    "ID статьи затрат": "expense_item_id",
+    "ID источника финансирования": "funding_source_id",
+    "Код АГСК": "agsk_id",
+    "ID КАТО закупки": "kato_purchase_id",
+    "ID КАТО поставки": "kato_delivery_id",
+}
+EXPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ROWS = 50000
+# Увеличивать при любом изменении состава/формата колонок выгрузки:
+# входит в ключ кэша выгрузок одобренных версий
+EXCEL_FORMAT_REVISION = 2
+
+def get_export_version(db: Session, plan_id: int, version_id: int = None) -> models.ProcurementPlanVersion:
+    """Находит версию (по умолчанию активную) и проверяет, что она относится к плану."""
     if version_id:
-        version = db.query(models.ProcurementPlanVersion).filter(models.ProcurementPlanVersion.id == version_id).first()
+        version = db.query(models.ProcurementPlanVersion).filter(
+            models.ProcurementPlanVersion.id == version_id,
+            models.ProcurementPlanVersion.plan_id == plan_id
+        ).first()
     else:
         version = _get_active_version(db, plan_id)
 
     if not version:
         raise HTTPException(status_code=404, detail="Версия сметы не найдена")
-
-    version_with_items = db.query(models.ProcurementPlanVersion).options(
-        selectinload(models.ProcurementPlanVersion.items).options(
-            joinedload(models.PlanItemVersion.enstru),
-            joinedload(models.PlanItemVersion.unit)
-        ),
-        joinedload(models.ProcurementPlanVersion.plan)
-    ).filter(models.ProcurementPlanVersion.id == version.id).one()
-
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = f"Смета {version_with_items.plan.id} v{version_with_items.version_number}"
-
-    headers = [
-        "№", "Код ЕНС ТРУ", "Наименование", "Ед. изм.",
-        "Кол-во", "Цена за ед.", "Общая сумма", "КТП", "Резидент"
+    return version
+
+def get_version_ktp_status(db: Session, plan_id: int, version_id: int) -> list[dict]:
+    """
+    Для каждой неудаленной позиции версии: есть ли ее код ЕНС ТРУ в реестре КТП
+    и совпадает ли это с признаком is_ktp позиции. Один запрос к позициям,
+    реестр проверяется в памяти.
+    """
+    version = get_export_version(db, plan_id, version_id)
+    Item = models.PlanItemVersion
+    rows = db.query(Item.id, Item.item_number, Item.trucode, Item.is_ktp).filter(
+        Item.version_id == version.id,
+        Item.is_deleted == False
+    ).order_by(Item.item_number).all()
+    in_registry = ktp_registry.check_codes(db, [row.trucode for row in rows])
+    return [
+        {
+            "item_id": row.id,
+            "item_number": row.item_number,
+            "trucode": row.trucode,
+            "is_ktp": row.is_ktp,
+            "in_registry": in_registry[row.trucode],
+        }
+        for row in rows
     ]
-    ws.append(headers)
-
-    for item in version_with_items.items:
-        row = [
-            item.item_number,
-            item.trucode,
-            item.enstru.name_ru if item.enstru else "",
-            item.unit.name_ru if item.unit else "",
-            item.quantity,
-            item.price_per_unit,
-            item.total_amount,
-            "Да" if item.is_ktp else "Нет",
-            "Да" if item.is_resident else "Нет",
+
+# Поля позиции, которые сравниваются между версиями
+DIFF_FIELDS = (
+    "trucode", "need_type", "unit_id", "expense_item_id", "funding_source_id", "agsk_id",
+    "kato_purchase_id", "kato_delivery_id", "quantity", "price_per_unit", "total_amount",
+    "is_ktp", "is_resident",
+)
+DIFF_BATCH_SIZE = 2000
+_DIFF_TOTAL = DIFF_FIELDS.index("total_amount") + 1
+
+def _diff_rows(db: Session, version_id: int):
+    """Неудаленные позиции версии кортежами (item_number, *DIFF_FIELDS) по возрастанию номера."""
+    item = models.PlanItemVersion
+    stmt = select(item.item_number, *(getattr(item, field) for field in DIFF_FIELDS)).where(
+        item.version_id == version_id,
+        item.is_deleted == False
+    ).order_by(item.item_number)
+    yield from db.execute(stmt, execution_options={"yield_per": DIFF_BATCH_SIZE})
+
+def _diff_item(row) -> dict:
+    return {"item_number": row[0], **dict(zip(DIFF_FIELDS, row[1:]))}
+
+def get_versions_diff(db: Session, plan_id: int, from_version_id: int, to_version_id: int) -> dict:
+    """
+    Сравнивает две версии плана. Позиции сопоставляются по item_number
+    (create_new_version_for_editing копирует их с теми же номерами).
+
+    Обе версии читаются потоково, отсортированными по item_number, и сливаются
+    за один проход — без загрузки ORM-объектов, память растет только с числом отличий.
+    Итоговые дельты берутся из метрик версий, которые поддерживаются инкрементально.
+    """
+    from_version = get_export_version(db, plan_id, from_version_id)
+    to_version = get_export_version(db, plan_id, to_version_id)
+
+    added, removed, changed = [], [], []
+    unchanged = 0
+    old_rows, new_rows = _diff_rows(db, from_version.id), _diff_rows(db, to_version.id)
+    old, new = next(old_rows, None), next(new_rows, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            removed.append(_diff_item(old))
+            old = next(old_rows, None)
+        elif old is None or new[0] < old[0]:
+            added.append(_diff_item(new))
+            new = next(new_rows, None)
+        else:
+            changes = {
+                field: {"old": old_value, "new": new_value}
+                for field, old_value, new_value in zip(DIFF_FIELDS, old[1:], new[1:])
+                if old_value != new_value
+            }
+            if changes:
+                changed.append({
+                    "item_number": new[0],
+                    "changes": changes,
+                    "total_amount_delta": new[_DIFF_TOTAL] - old[_DIFF_TOTAL],
+                })
+            else:
+                unchanged += 1
+            old, new = next(old_rows, None), next(new_rows, None)
+
+    def delta(field: str) -> Decimal:
+        return (getattr(to_version, field) or Decimal("0")) - (getattr(from_version, field) or Decimal("0"))
+
+    return {
+        "from_version": from_version,
+        "to_version": to_version,
+        "totals": {
+            field + "_delta": delta(field)
+            for field in ("total_amount", "ktp_amount", "ktp_percentage", "import_percentage")
+        },
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+        "unchanged_count": unchanged,
+    }
+
+def _excel_row_batches(db: Session, version_id: int):
+    """Читает позиции версии через серверный курсор пачками по EXPORT_BATCH_SIZE."""
+    item = models.PlanItemVersion
+    stmt = select(
+        item.item_number,
+        item.trucode,
+        models.Enstru.name_ru,
+        models.Mkei.name_ru,
+        item.quantity,
+        item.price_per_unit,
+        item.total_amount,
+        item.is_ktp,
+        item.is_resident,
+        item.unit_id,
+        item.expense_item_id,
+        item.funding_source_id,
+        item.agsk_id,
+        item.kato_purchase_id,
+        item.kato_delivery_id,
+    ).outerjoin(models.Enstru, models.Enstru.code == item.trucode
+    ).outerjoin(models.Mkei, models.Mkei.id == item.unit_id
+    ).where(
+        item.version_id == version_id,
+        item.is_deleted == False
+    ).order_by(item.item_number)
+
+    result = db.execute(stmt, execution_options={"yield_per": EXPORT_BATCH_SIZE})
+    for partition in result.partitions():
+        yield [
+            [
+                number, trucode, enstru_name or "", unit_name or "",
+                quantity, price, total,
+                "Да" if is_ktp else "Нет",
+                "Да" if is_resident else "Нет",
+                *references,
+            ]
+            for number, trucode, enstru_name, unit_name, quantity, price, total, is_ktp, is_resident, *references in partition
         ]
-        ws.append(row)
 
-    virtual_workbook = io.BytesIO()
-    wb.save(virtual_workbook)
-    return virtual_workbook.getvalue()
+def stream_plan_to_excel(plan_id: int, version_id: int, version_number: int):
+    """
+    Потоковый экспорт версии в Excel. Генератор работает со своей сессией,
+    так как выполняется уже после выхода из обработчика запроса.
+    """
+    db = ReadOnlySessionLocal()
+    try:
+        yield from stream_xlsx(
+            f"Смета {plan_id} v{version_number}",
+            EXCEL_HEADERS,
+            _excel_row_batches(db, version_id),
+        )
+    finally:
+        db.close()
+
+# ========= Импорт позиций из Excel =========
+
+_EXCEL_TRUE = {"да", "иә", "yes", "true", "1"}
+_EXCEL_REQUIRED = ("trucode", "quantity", "price_per_unit", "expense_item_id", "funding_source_id")
+
+def _excel_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return (cell_text(value) or "").lower() in _EXCEL_TRUE
+
+def parse_items_file(file, filename: str) -> tuple[list[tuple[int, plan_schema.PlanItemCreate]], list[dict]]:
+    """
+    Потоково читает позиции из файла в формате выгрузки (XLSX в режиме read_only или CSV).
+    Колонки ищутся по заголовкам, лишние (№, наименования, общая сумма) игнорируются.
+    Возвращает (номер строки, позиция) для строк, прошедших проверку схемы, и ошибки по строкам.
+    Не обращается к БД, поэтому может выполняться вне сессии.
+    """
+    try:
+        headers, rows = iter_table(file, filename)
+        positions = {
+            field: headers.index(title.lower())
+            for title, field in EXCEL_IMPORT_COLUMNS.items()
+            if title.lower() in headers
+        }
+        missing = [title for title, field in EXCEL_IMPORT_COLUMNS.items() if field in _EXCEL_REQUIRED and field not in positions]
+        if missing:
+            raise ValueError(f"В файле нет обязательных колонок: {', '.join(missing)}")
+
+        items, errors = [], []
+        for row_number, row in rows:
+            if len(items) + len(errors) >= IMPORT_MAX_ROWS:
+                raise ValueError(f"В файле больше {IMPORT_MAX_ROWS} позиций")
+            data = {field: row[pos] if pos < len(row) else None for field, pos in positions.items()}
+            for field in ("trucode", "agsk_id"):
+                if field in data:
+                    data[field] = cell_text(data[field])
+            for field in ("is_ktp", "is_resident"):
+                if field in data:
+                    data[field] = _excel_bool(data[field])
+            try:
+                items.append((row_number, plan_schema.PlanItemCreate.model_validate(data)))
+            except ValidationError as e:
+                for error in e.errors():
+                    field = error["loc"][0] if error["loc"] else None
+                    errors.append({"row": row_number, "field": field, "value": data.get(field), "message": error["msg"]})
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return items, errors
+
+def import_items_to_plan(
+    db: Session,
+    plan_id: int,
+    items: list[tuple[int, plan_schema.PlanItemCreate]],
+    errors: list[dict],
+    user: models.User,
+) -> dict:
+    """
+    Добавляет в черновик позиции, прочитанные parse_items_file. Ссылки на справочники
+    проверяются по ключам в памяти за один проход; строки с ошибками попадают в отчет,
+    остальные вставляются одной транзакцией через _insert_items.
+    """
+    active_version = _get_draft_version_for_items(db, plan_id)
+    items_in = [item for _, item in items]
+    enstru_types, reference_errors = _reference_errors(db, items_in)
+
+    # Строки, не прошедшие проверку схемы, в items не попали
+    rows_read = len(items) + len({error["row"] for error in errors})
+    errors = list(errors)
+    invalid = set()
+    for error in reference_errors:
+        invalid.add(error["index"])
+        errors.append({
+            "row": items[error["index"]][0],
+            "field": error["field"],
+            "value": error["value"],
+            "message": "Значение не найдено в справочнике",
+        })
+    errors.sort(key=lambda error: error["row"])
+
+    valid = [item for index, item in enumerate(items_in) if index not in invalid]
+    result = {"created": 0, "first_item_number": None, "last_item_number": None, "version": active_version}
+    if valid:
+        result = _insert_items(db, active_version, valid, enstru_types)
+    else:
+        db.rollback()
+    result["rows"] = rows_read
+    result["errors"] = errors
+    return result
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, NamedTuple
+
+from sqlalchemy.orm import Session
+from ..models import models
+
+# Через сколько секунд кэш перечитывается сам (нужно, когда воркеров несколько
+# и /admin/reference/reload попал только в один из них)
+REFERENCE_CACHE_TTL = int(os.getenv("REFERENCE_CACHE_TTL", "600"))
+# Сколько браузер/прокси может не перепроверять ответ справочника
+REFERENCE_HTTP_MAX_AGE = int(os.getenv("REFERENCE_HTTP_MAX_AGE", "300"))
+
+DEFAULT_LIMIT = 50
+
+
+class ReferenceSnapshot(NamedTuple):
+    """
+    Загруженное содержимое справочника. Публикуется одной ссылкой, поэтому
+    строки, строки поиска и версия всегда относятся к одной загрузке.
+    """
+    name: str
+    rows: list[dict]
+    haystacks: list[str]
+    version: str | None
+    loaded_at: float
+
+    def search(self, q: str | None, limit: int = DEFAULT_LIMIT) -> list[dict]:
+        if not q:
+            return self.rows[:limit]
+        q = q.lower()
+        return [row for row, text in zip(self.rows, self.haystacks) if q in text][:limit]
+
+    def etag(self, q: str | None) -> str:
+        query_hash = hashlib.sha1((q or "").encode()).hexdigest()[:8]
+        return f'W/"{self.name}-{self.version}-{query_hash}"'
+
+
+class ReferenceTable:
+    """
+    Небольшой справочник, целиком загруженный в память.
+
+    version — хэш содержимого, поэтому он одинаков во всех воркерах
+    и меняется только при реальном изменении данных.
+    get()/load() возвращают неизменяемый ReferenceSnapshot: перезагрузка
+    подменяет его целиком и не влияет на уже выданные снимки.
+    """
+
+    def __init__(self, name: str, model, fields: tuple[str, ...], search_fields: tuple[str, ...]):
+        self.name = name
+        self.model = model
+        self.fields = fields
+        self.search_fields = search_fields
+        self._snapshot = ReferenceSnapshot(name, [], [], None, 0.0)
+
+    def _is_stale(self, snapshot: ReferenceSnapshot) -> bool:
+        return snapshot.version is None or time.monotonic() - snapshot.loaded_at > REFERENCE_CACHE_TTL
+
+    def load(self, db: Session) -> ReferenceSnapshot:
+        columns = [getattr(self.model, f) for f in self.fields]
+        rows = [dict(zip(self.fields, row)) for row in db.query(*columns).order_by(self.model.id)]
+        digest = hashlib.sha1(json.dumps(rows, ensure_ascii=False, default=str).encode()).hexdigest()
+        haystacks = ["\n".join(str(r[f] or "") for f in self.search_fields).lower() for r in rows]
+        snapshot = ReferenceSnapshot(self.name, rows, haystacks, digest[:16], time.monotonic())
+        self._snapshot = snapshot
+        return snapshot
+
+    def get(self, db: Session) -> ReferenceSnapshot:
+        snapshot = self._snapshot
+        if self._is_stale(snapshot):
+            snapshot = self.load(db)
+        return snapshot
+
+    def peek(self) -> ReferenceSnapshot | None:
+        """Текущий снимок без обращения к БД (None, если справочник еще не загружен)."""
+        snapshot = self._snapshot
+        return snapshot if snapshot.version is not None else None
+
+    def invalidate(self):
+        self._snapshot = self._snapshot._replace(version=None)
+
+
+class ReferenceIndex:
+    """
+    Структура в памяти, построенная по справочнику (индекс ЕНС ТРУ, дерево KATO,
+    коды реестра КТП). Как и ReferenceTable, устаревает через REFERENCE_CACHE_TTL:
+    справочник, загруженный другим процессом (CLI, другой воркер), виден всем
+    воркерам не позже чем через TTL.
+
+    Значение и время построения публикуются одним кортежем. Пока один поток
+    перестраивает устаревшую структуру, остальные получают прежнюю.
+    """
+
+    def __init__(self, build: Callable[[Session], object]):
+        self._build = build
+        self._state: tuple[object, float] | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_stale(state) -> bool:
+        return state is None or time.monotonic() - state[1] > REFERENCE_CACHE_TTL
+
+    def load(self, db: Session):
+        value = self._build(db)
+        self._state = (value, time.monotonic())
+        return value
+
+    def get(self, db: Session):
+        state = self._state
+        if not self._is_stale(state):
+            return state[0]
+        # Без готового значения ждем построения, иначе отдаем прежнее, если уже строит другой поток
+        if not self._lock.acquire(blocking=state is None):
+            return state[0]
+        try:
+            state = self._state
+            if self._is_stale(state):
+                return self.load(db)
+            return state[0]
+        finally:
+            self._lock.release()
+
+    def peek(self):
+        """Текущее значение без обращения к БД (None, если структура еще не построена)."""
+        state = self._state
+        return state[0] if state is not None else None
+
+    def invalidate(self):
+        self._state = None
+
+
+mkei_cache = ReferenceTable(
+    "mkei", models.Mkei, ("id", "code", "name_kz", "name_ru"), ("code", "name_ru")
+)
+cost_item_cache = ReferenceTable(
+    "cost_items", models.Cost_Item, ("id", "name_ru", "name_kz"), ("name_ru", "name_kz")
+)
+source_funding_cache = ReferenceTable(
+    "source_funding", models.Source_Funding, ("id", "name_ru", "name_kz"), ("name_ru", "name_kz")
+)
+
+REFERENCE_TABLES = (mkei_cache, cost_item_cache, source_funding_cache)
+
+# Прочие структуры в памяти (индекс ЕНС ТРУ и т.п.) регистрируются здесь,
+# чтобы перестраиваться вместе со справочниками
+_reload_hooks: list[Callable[[Session], object]] = []
+
+
+def register_reload_hook(hook: Callable[[Session], object]):
+    if hook not in _reload_hooks:
+        _reload_hooks.append(hook)
+    return hook
+
+
+def reload_reference_data(db: Session) -> dict:
+    """Перечитывает все справочники и перестраивает зависящие от них индексы."""
+    versions = {}
+    for table in REFERENCE_TABLES:
+        versions[table.name] = table.load(db).version
+    for hook in _reload_hooks:
+        hook(db)
+    return versions
@@ -0,0 +1,321 @@
+import datetime
+import functools
+import os
+import time
+from typing import BinaryIO, Iterable, Iterator
+
+from fastapi import HTTPException, status
+from sqlalchemy import Date, DateTime, Integer, delete, exists, func, insert, select, text, update
+from sqlalchemy.orm import Session
+from ..models import models
+from ..utils.table_reader import cell_text, iter_table
+from . import reference_cache
+
+# Сколько строк уходит в БД одним executemany
+REFERENCE_LOAD_CHUNK_SIZE = int(os.getenv("REFERENCE_LOAD_CHUNK_SIZE", "5000"))
+# Сколько ошибок по строкам попадает в отчет
+MAX_REPORTED_ERRORS = 20
+
+
+class ReferenceSpec:
+    """
+    Описание загружаемого справочника.
+
+    key — столбцы, по которым строка файла совпадает со строкой таблицы (upsert).
+    Без key таблица заменяется целиком: так загружается реестр КТП, у которого
+    нет уникального ключа и который публикуется полным снимком.
+    sync_key — естественный ключ для дельта-синхронизации (по умолчанию key).
+    """
+
+    def __init__(self, model, key: tuple[str, ...] = (), sync_key: tuple[str, ...] | None = None):
+        self.model = model
+        self.table = model.__table__
+        self.name = self.table.name
+        self.key = key
+        self.sync_key = sync_key or key
+        self.columns = tuple(c.name for c in self.table.columns)
+        self.required = tuple(
+            c.name for c in self.table.columns
+            if not c.nullable and not c.primary_key and c.default is None and c.server_default is None
+        )
+
+
+REFERENCE_SPECS = {
+    spec.name: spec
+    for spec in (
+        ReferenceSpec(models.Enstru, key=("code",)),
+        ReferenceSpec(models.Kato, key=("code",)),
+        ReferenceSpec(models.Agsk, key=("code",)),
+        ReferenceSpec(models.Mkei, key=("code",)),
+        ReferenceSpec(models.Cost_Item, key=("id",)),
+        ReferenceSpec(models.Source_Funding, key=("id",)),
+        ReferenceSpec(models.Reestr_KTP, sync_key=("bin_iin", "ens_tru_code")),
+    )
+}
+
+
+def get_spec(table_name: str) -> ReferenceSpec:
+    spec = REFERENCE_SPECS.get(table_name)
+    if spec is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Неизвестный справочник: {table_name}. Доступны: {', '.join(REFERENCE_SPECS)}"
+        )
+    return spec
+
+
+def _integer(value):
+    if value is None or type(value) is int:
+        return value
+    if type(value) is str:
+        value = value.strip()
+        if not value:
+            return None
+    return int(float(value))
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_date(value: str) -> datetime.date:
+    return datetime.date.fromisoformat(value[:10])
+
+
+def _date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if value is None or isinstance(value, datetime.date):
+        return value
+    value = str(value).strip()
+    return _parse_date(value) if value else None
+
+
+def _datetime(value):
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    value = str(value).strip()
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+def _converter(column):
+    """Функция приведения значения ячейки к типу столбца; пустые ячейки — NULL."""
+    if isinstance(column.type, Integer):
+        return _integer
+    if isinstance(column.type, DateTime):
+        return _datetime
+    if isinstance(column.type, Date):
+        return _date
+    return cell_text
+
+
+def _parse_rows(spec: ReferenceSpec, headers: list[str], rows: Iterable[tuple[int, tuple]], report: dict) -> Iterator[tuple[int, dict]]:
+    """Строки файла -> (номер строки, словарь по столбцам таблицы); некорректные строки попадают в report["errors"]."""
+    positions = {name: headers.index(name) for name in spec.columns if name in headers}
+    not_null = list(dict.fromkeys((*spec.key, *spec.sync_key, *spec.required)))
+    missing = [name for name in not_null if name not in positions]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"В файле нет обязательных столбцов: {', '.join(missing)}"
+        )
+    columns = [(name, _converter(spec.table.columns[name]), pos) for name, pos in positions.items()]
+    return _iter_values(columns, not_null, rows, report)
+
+
+def _iter_values(columns: list, not_null: list[str], rows: Iterable[tuple[int, tuple]], report: dict) -> Iterator[tuple[int, dict]]:
+    for row_number, row in rows:
+        try:
+            values = {name: convert(row[pos] if pos < len(row) else None) for name, convert, pos in columns}
+            empty = [name for name in not_null if values[name] is None]
+            if empty:
+                raise ValueError(f"пустые обязательные поля: {', '.join(empty)}")
+        except (TypeError, ValueError) as e:
+            report["skipped"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"row": row_number, "error": str(e)})
+            continue
+        yield row_number, values
+
+
+def _chunks(rows: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _upsert_statement(db: Session, spec: ReferenceSpec, columns: Iterable[str]):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=f"Загрузка не поддерживается для {dialect}")
+    stmt = dialect_insert(spec.table)
+    update_columns = {name: stmt.excluded[name] for name in columns if name not in spec.key and name != "id"}
+    if not update_columns:
+        return stmt.on_conflict_do_nothing(index_elements=list(spec.key))
+    return stmt.on_conflict_do_update(index_elements=list(spec.key), set_=update_columns)
+
+
+def _sync_id_sequence(db: Session, spec: ReferenceSpec):
+    """После вставки явных id в PostgreSQL сдвигает последовательность, иначе следующий INSERT получит занятый id."""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    max_id = db.execute(select(func.max(spec.table.c.id))).scalar()
+    if max_id is not None:
+        db.execute(
+            text("SELECT setval(pg_get_serial_sequence(:table, 'id'), :max_id)"),
+            {"table": spec.name, "max_id": max_id}
+        )
+
+
+def _row_hash(values: tuple) -> int:
+    # Хэши таблицы и файла считаются в одном процессе, поэтому встроенного hash() достаточно
+    return hash(values)
+
+
+def _referencing_columns(spec: ReferenceSpec) -> list[tuple]:
+    """Внешние ключи других таблиц на этот справочник: (столбец-ссылка, столбец справочника)."""
+    return [
+        (fk.parent, spec.table.c[fk.column.name])
+        for table in spec.table.metadata.tables.values()
+        for fk in table.foreign_keys
+        if fk.column.table is spec.table
+    ]
+
+
+def _referenced_ids(db: Session, spec: ReferenceSpec, ids: list[int]) -> set[int]:
+    """Какие из строк справочника используются в позициях смет (их удалять нельзя)."""
+    found: set[int] = set()
+    for parent, target in _referencing_columns(spec):
+        query = select(spec.table.c.id).where(spec.table.c.id.in_(ids), exists().where(parent == target))
+        found.update(db.execute(query).scalars())
+    return found
+
+
+def _sync_delta(db: Session, spec: ReferenceSpec, columns: list[str], parsed: Iterator[tuple[int, dict]], chunk_size: int, report: dict):
+    """
+    Применяет только отличия файла от таблицы.
+
+    Хэши текущих строк (по тем же столбцам, что есть в файле) считаются одним
+    потоковым чтением; строки файла сравниваются с ними по естественному ключу
+    и копятся в пачки вставок и обновлений. Строки, которых нет в файле,
+    удаляются в конце, кроме тех, на которые ссылаются сметы.
+    """
+    key, compared = spec.sync_key, [name for name in columns if name != "id"]
+    stored: dict[tuple, tuple[int, int]] = {}
+    duplicate_ids: list[int] = []
+    query = select(spec.table.c.id, *(spec.table.c[name] for name in compared)).order_by(spec.table.c.id)
+    for row in db.execute(query.execution_options(yield_per=10000)):
+        values = dict(zip(compared, row[1:]))
+        # id не входит в сравниваемые столбцы, но может быть ключом (статьи затрат, источники)
+        row_key = tuple(row[0] if k == "id" else values[k] for k in key)
+        if row_key in stored:
+            duplicate_ids.append(row[0])
+        else:
+            stored[row_key] = (row[0], _row_hash(tuple(values.values())))
+
+    seen: set[tuple] = set()
+    inserts: list[dict] = []
+    updates: list[dict] = []
+
+    def flush(force: bool = False):
+        if inserts and (force or len(inserts) >= chunk_size):
+            db.execute(insert(spec.table), inserts)
+            inserts.clear()
+        if updates and (force or len(updates) >= chunk_size):
+            db.execute(update(spec.model), updates)
+            updates.clear()
+
+    for row_number, values in parsed:
+        row_key = tuple(values[k] for k in key)
+        if row_key in seen:
+            report["skipped"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"row": row_number, "error": f"повтор ключа {', '.join(map(str, row_key))}"})
+            continue
+        seen.add(row_key)
+        report["rows"] += 1
+        current = stored.get(row_key)
+        if current is None:
+            inserts.append(values)
+            report["inserted"] += 1
+        elif current[1] != _row_hash(tuple(values[name] for name in compared)):
+            updates.append({**{name: values[name] for name in compared}, "id": current[0]})
+            report["updated"] += 1
+        else:
+            report["unchanged"] += 1
+        flush()
+    flush(force=True)
+
+    removed = [row_id for row_key, (row_id, _) in stored.items() if row_key not in seen] + duplicate_ids
+    for start in range(0, len(removed), chunk_size):
+        ids = removed[start:start + chunk_size]
+        referenced = _referenced_ids(db, spec, ids)
+        ids = [row_id for row_id in ids if row_id not in referenced]
+        if ids:
+            db.execute(delete(spec.table).where(spec.table.c.id.in_(ids)))
+        report["deleted"] += len(ids)
+        report["kept_referenced"] += len(referenced)
+
+
+def load_reference_file(
+    db: Session,
+    table_name: str,
+    file: BinaryIO,
+    filename: str,
+    chunk_size: int = REFERENCE_LOAD_CHUNK_SIZE,
+    delta: bool = False,
+) -> dict:
+    """
+    Потоково загружает справочник из XLSX/CSV. Заголовки файла — имена столбцов таблицы.
+
+    Строки пишутся пачками по chunk_size (executemany) в одной транзакции:
+    при ошибке БД таблица остается в прежнем состоянии. После загрузки
+    перечитываются справочники и индексы в памяти.
+
+    delta=True — файл считается полным снимком справочника, а в таблицу пишутся
+    только вставки, изменения и удаления (см. _sync_delta).
+    """
+    spec = get_spec(table_name)
+    try:
+        headers, rows = iter_table(file, filename)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    mode = "delta" if delta else "upsert" if spec.key else "replace"
+    report = {"table": spec.name, "mode": mode, "rows": 0, "skipped": 0, "errors": []}
+    if delta:
+        report.update(inserted=0, updated=0, deleted=0, unchanged=0, kept_referenced=0)
+    started = time.perf_counter()
+    parsed = _parse_rows(spec, headers, rows, report)
+    try:
+        if delta:
+            _sync_delta(db, spec, [name for name in spec.columns if name in headers], parsed, chunk_size, report)
+        elif spec.key:
+            for chunk in _chunks((values for _, values in parsed), chunk_size):
+                # Повторы ключа внутри пачки: остается последняя строка (PostgreSQL не примет две в одном INSERT)
+                unique = list({tuple(row[k] for k in spec.key): row for row in chunk}.values())
+                db.execute(_upsert_statement(db, spec, unique[0].keys()), unique)
+                report["rows"] += len(unique)
+        else:
+            db.execute(delete(spec.table))
+            for chunk in _chunks((values for _, values in parsed), chunk_size):
+                db.execute(insert(spec.table), chunk)
+                report["rows"] += len(chunk)
+        if "id" in headers:
+            _sync_id_sequence(db, spec)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    elapsed = time.perf_counter() - started
+    report["seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["rows"] / elapsed) if elapsed > 0 else report["rows"]
+    report["versions"] = reference_cache.reload_reference_data(db)
+    return report
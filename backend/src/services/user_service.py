@@ -0,0 +1,17 @@
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from ..models import models
+from ..utils.auth import invalidate_user_cache
+
+
+def set_user_active(db: Session, user_id: int, is_active: bool) -> models.User:
+    """Включает или отключает пользователя и сразу сбрасывает его запись в кэше авторизации."""
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пользователь не найден")
+    user.is_active = is_active
+    db.commit()
+    db.refresh(user)
+    invalidate_user_cache(user.iin)
+    return user
@@ -4,15 +4,25 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from typing import Optional
+import os
 
-from sqlalchemy.orm import Session
-from ..database.database import get_db
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from ..database.database import get_read_db, get_async_read_db
 from ..models.models import User
+from .cache import LRUCache
 
 # --- Конфигурация ---
 SECRET_KEY = "a_very_secret_key_that_should_be_in_env_vars"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 часа
+# ИИН пользователей с правами администратора (через запятую)
+ADMIN_IINS = {iin.strip() for iin in os.getenv("ADMIN_IINS", "").split(",") if iin.strip()}
+# Кэш пользователей по ИИН (sub токена): сколько секунд живет запись и сколько записей хранится
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+_user_cache = LRUCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
 
 # --- Утилиты для паролей и токенов ---
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -42,15 +52,41 @@ def authenticate_user(db: Session, iin: str, password: str) -> Optional[User]:
     В реальном приложении здесь была бы проверка пароля.
     """
     user = db.query(User).filter(User.iin == iin).first()
-    if not user:
+    if not user or user.is_active is False:
         return None
     # if not verify_password(password, user.hashed_password): # Если бы был пароль
     #     return None
     return user
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+def _user_snapshot(user: User) -> dict:
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+
+def _user_from_cache(db: Session, iin: str) -> Optional[User]:
+    """
+    Пользователь из кэша, присоединенный к текущей сессии без запроса к БД.
+    Каждый запрос получает свой экземпляр: объекты ORM между сессиями не делятся.
+    """
+    snapshot = _user_cache.get(iin)
+    if snapshot is None:
+        return None
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def invalidate_user_cache(iin: Optional[str] = None):
+    """Сбрасывает кэш для одного пользователя или целиком (iin=None)."""
+    if iin is None:
+        _user_cache.clear()
+    else:
+        _user_cache.pop(iin)
+
+
+def resolve_user(db: Session, token: str) -> User:
     """
-    Декодирует токен, извлекает ИИН пользователя и возвращает объект User из БД.
+    Декодирует токен, извлекает ИИН пользователя и возвращает объект User.
+    Пользователь берется из кэша, к БД обращаемся только при промахе.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -64,8 +100,38 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(User).filter(User.iin == iin).first()
+
+    user = _user_from_cache(db, iin)
     if user is None:
-        raise credentials_exception
+        user = db.query(User).filter(User.iin == iin).first()
+        if user is None:
+            raise credentials_exception
+        _user_cache.set(iin, _user_snapshot(user))
+    if user.is_active is False:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Пользователь деактивирован")
     return user
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)) -> User:
+    """
+    Текущий пользователь по токену.
+    В пределах одного запроса FastAPI вызывает зависимость один раз,
+    даже если она объявлена и в роутере, и в обработчике.
+    Пользователь читается через сессию чтения: в режиме SQLite сессия записи
+    начинается с BEGIN IMMEDIATE, и промах кэша на GET держал бы блокировку записи.
+    """
+    return resolve_user(db, token)
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db=Depends(get_async_read_db)) -> User:
+    """То же для асинхронного режима (DB_MODE=async): пользователь привязан к AsyncSession запроса."""
+    return await db.run_sync(resolve_user, token)
+
+def is_admin(user: User) -> bool:
+    return user.iin in ADMIN_IINS
+
+def require_admin(current_user: User = Depends(get_current_user)) -> User:
+    """Пропускает только пользователей из ADMIN_IINS."""
+    if not is_admin(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Требуются права администратора")
+    return current_user
@@ -0,0 +1,71 @@
+import os
+import re
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_CHUNK_SIZE = 64 * 1024
+
+
+def _read_range(path: str, start: int, end: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def cached_file_response(
+    request: Request,
+    path: str,
+    etag: str,
+    media_type: str,
+    filename: str,
+    cache_control: str = "private, max-age=86400",
+) -> Response:
+    """
+    Отдает неизменяемый файл с ETag, поддержкой If-None-Match и одного диапазона Range.
+    Полный файл отдается через FileResponse (sendfile, если сервер его поддерживает).
+    """
+    size = os.path.getsize(path)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    match = _RANGE_RE.match(range_header.strip()) if range_header else None
+    if match and (if_range is None or if_range == etag):
+        first, last = match.groups()
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+        elif last:
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start, end = 0, -1
+        end = min(end, size - 1)
+        if start > end or start >= size:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        return StreamingResponse(
+            _read_range(path, start, end),
+            status_code=206,
+            media_type=media_type,
+            headers={
+                **headers,
+                "Content-Range": f"bytes {start}-{end}/{size}",
+                "Content-Length": str(end - start + 1),
+            },
+        )
+
+    return FileResponse(path, media_type=media_type, headers=headers)
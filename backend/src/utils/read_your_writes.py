@@ -0,0 +1,33 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..database.database import DB_REPLICA_STICKY_SECONDS, PRIMARY_STICKY_COOKIE
+
+_MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class ReadYourWritesMiddleware:
+    """
+    После успешного изменяющего запроса ставит короткоживущую cookie: пока она есть,
+    get_read_db отдает сессию основной БД, и клиент сразу видит свои изменения,
+    даже если реплика еще не догнала.
+    """
+
+    def __init__(self, app: ASGIApp, path: str = "/api"):
+        self.app = app
+        self.cookie = (
+            f"{PRIMARY_STICKY_COOKIE}=1; Max-Age={DB_REPLICA_STICKY_SECONDS}; "
+            f"Path={path}; HttpOnly; SameSite=Lax"
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in _MUTATING_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                MutableHeaders(raw=message["headers"]).append("set-cookie", self.cookie)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,40 @@
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
+
+
+def _orjson_default(obj):
+    # Деньги отдаются строкой с сохранением масштаба ("1234.50"), как это делает pydantic
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError
+
+
+class ORJSONResponse(JSONResponse):
+    """Ответ по умолчанию для API: orjson вместо стандартного json."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+class PydanticJSONResponse(Response):
+    """
+    Сериализует ORM-объекты или модели по схеме сразу в JSON-байты средствами
+    pydantic-core, минуя промежуточные словари и json.dumps.
+    Используется в эндпоинтах с большими ответами (планы, позиции).
+    """
+    media_type = "application/json"
+
+    def __init__(self, schema, content: Any, status_code: int = 200, headers: dict | None = None):
+        adapter = _adapter(schema)
+        body = adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+        super().__init__(content=body, status_code=status_code, headers=headers, media_type=self.media_type)
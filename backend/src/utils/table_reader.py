@@ -0,0 +1,74 @@
+import csv
+import io
+import zipfile
+from typing import BinaryIO, Iterator
+
+# Потоковое чтение табличных файлов (XLSX/CSV) построчно: файл не загружается
+# в память целиком, openpyxl работает в режиме read_only.
+
+
+def _csv_rows(file: BinaryIO) -> Iterator[tuple]:
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    sample = text.read(64 * 1024)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    try:
+        for row in csv.reader(text, dialect):
+            yield tuple(value if value != "" else None for value in row)
+    finally:
+        # Не даем TextIOWrapper закрыть файл вызывающего
+        if not text.closed:
+            text.detach()
+
+
+def _xlsx_rows(file: BinaryIO) -> Iterator[tuple]:
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+        raise ValueError("Файл не является книгой Excel") from e
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def cell_text(value) -> str | None:
+    """Текст ячейки без пробелов по краям; коды, которые Excel хранит числами, без ".0"."""
+    if value is None:
+        return None
+    if type(value) is str:
+        return value.strip() or None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def iter_table(file: BinaryIO, filename: str) -> tuple[list[str], Iterator[tuple[int, tuple]]]:
+    """
+    Заголовки (первая строка, в нижнем регистре) и итератор (номер строки в файле, строка).
+    Формат определяется по расширению: .xlsx/.xlsm или .csv.
+    Пустые строки пропускаются.
+    """
+    name = filename.lower()
+    if name.endswith((".xlsx", ".xlsm")):
+        rows = _xlsx_rows(file)
+    elif name.endswith(".csv"):
+        rows = _csv_rows(file)
+    else:
+        raise ValueError(f"Неподдерживаемый формат файла: {filename}")
+
+    header = next(rows, None)
+    if header is None:
+        return [], iter(())
+    headers = [str(h).strip().lower() if h is not None else "" for h in header]
+    return headers, (
+        (number, row)
+        for number, row in enumerate(rows, start=2)
+        if any(v is not None and v != "" for v in row)
+    )
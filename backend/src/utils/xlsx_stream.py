@@ -0,0 +1,162 @@
+import re
+import zipfile
+from decimal import Decimal
+from typing import Iterable, Iterator, Sequence
+from xml.sax.saxutils import escape, quoteattr
+
+# Минимальный потоковый генератор XLSX: файл собирается из XML-частей прямо
+# в zip-поток, поэтому память не зависит от числа строк, а клиент получает
+# первые байты, пока строки еще читаются из БД.
+
+# Дата, которая пишется во все части архива: иначе zipfile ставит текущее время
+# и одинаковые данные дают разные байты (а значит, разный хэш и ETag выгрузки)
+_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<Relationships xmlns="{_PKG_REL_NS}">'
+    f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<Relationships xmlns="{_PKG_REL_NS}">'
+    f'<Relationship Id="rId1" Type="{_REL_NS}/worksheet" Target="worksheets/sheet1.xml"/>'
+    f'<Relationship Id="rId2" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<styleSheet xmlns="{_MAIN_NS}">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+# Символы, недопустимые в XML 1.0 (openpyxl для них бросает IllegalCharacterError)
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+
+class _ChunkSink:
+    """Файлоподобный приемник без seek/tell: zipfile пишет в него в потоковом режиме."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _column_letter(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _cell(ref: str, value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    text = escape(_ILLEGAL_XML_CHARS.sub("", str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _entry(name: str) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, date_time=_ZIP_DATE_TIME)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o600 << 16
+    return info
+
+
+def _row(number: int, values: Sequence, columns: list[str]) -> str:
+    cells = "".join(_cell(f"{columns[i]}{number}", v) for i, v in enumerate(values))
+    return f'<row r="{number}">{cells}</row>'
+
+
+def stream_xlsx(
+    sheet_title: str,
+    headers: Sequence[str],
+    row_batches: Iterable[Iterable[Sequence]],
+) -> Iterator[bytes]:
+    """
+    Генерирует XLSX-файл кусками. row_batches — итератор пачек строк;
+    после каждой пачки наружу отдается все, что успело попасть в zip-поток.
+    """
+    sink = _ChunkSink()
+    title = _INVALID_SHEET_CHARS.sub(" ", sheet_title)[:31] or "Sheet1"
+    columns = [_column_letter(i) for i in range(len(headers))]
+
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(_entry("[Content_Types].xml"), _CONTENT_TYPES)
+        zf.writestr(_entry("_rels/.rels"), _ROOT_RELS)
+        zf.writestr(_entry("xl/_rels/workbook.xml.rels"), _WORKBOOK_RELS)
+        zf.writestr(_entry("xl/styles.xml"), _STYLES)
+        zf.writestr(
+            _entry("xl/workbook.xml"),
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}"><sheets>'
+            f'<sheet name={quoteattr(title)} sheetId="1" r:id="rId1"/>'
+            '</sheets></workbook>'
+        )
+        yield sink.drain()
+
+        with zf.open(_entry("xl/worksheets/sheet1.xml"), "w", force_zip64=True) as sheet:
+            sheet.write(
+                ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                 f'<worksheet xmlns="{_MAIN_NS}"><sheetData>').encode()
+            )
+            sheet.write(_row(1, headers, columns).encode())
+            number = 1
+            for batch in row_batches:
+                parts = []
+                for values in batch:
+                    number += 1
+                    parts.append(_row(number, values, columns))
+                sheet.write("".join(parts).encode())
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+            sheet.write(b"</sheetData></worksheet>")
+
+    yield sink.drain()
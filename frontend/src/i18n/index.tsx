@@ -19,6 +19,7 @@ const translations = {
     // Dashboard
     dashboard_title: 'Мои сметы закупок',
     no_plans_found: 'Сметы не найдены.',
+    load_more: 'Показать еще',
     smeta_id: 'ID',
     smeta_year: 'Год',
     smeta_amount: 'Сумма',
@@ -87,6 +88,7 @@ const translations = {
     // Dashboard
     dashboard_title: 'Менің сатып алу сметаларым',
     no_plans_found: 'Сметалар табылмады.',
+    load_more: 'Тағы көрсету',
     smeta_id: 'ID',
     smeta_year: 'Жылы',
     smeta_amount: 'Сомасы',
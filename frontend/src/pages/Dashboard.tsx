@@ -15,10 +15,10 @@ import { useNavigate } from 'react-router-dom';
 import { useTranslation } from '../i18n/index.tsx';
 import Header from '../components/Header';
 import {
-  getPlans, deletePlan, createPlan, createVersion, deleteLatestVersion, exportVersionToExcel,
+  getPlans, getPlanVersions, deletePlan, createPlan, createVersion, deleteLatestVersion, exportVersionToExcel,
   PlanStatus
 } from '../services/api';
-import type { ProcurementPlan, ProcurementPlanVersion } from '../services/api';
+import type { ProcurementPlanSummary, ProcurementPlanVersion } from '../services/api';
 import { format } from 'date-fns';
 
 // Helper function to format currency
@@ -36,10 +36,11 @@ const getStatusChipColor = (status: PlanStatus) => {
 };
 
 // Row component for the main plan table
-function PlanRow({ plan, onReload }: { plan: ProcurementPlan; onReload: () => void; }) {
+function PlanRow({ plan, onReload }: { plan: ProcurementPlanSummary; onReload: () => void; }) {
   const { t } = useTranslation();
   const navigate = useNavigate();
   const [open, setOpen] = useState(false);
+  const [versions, setVersions] = useState<ProcurementPlanVersion[] | null>(null);
   const [isErrorDialogOpen, setErrorDialogOpen] = useState(false);
   const [errorDialogMessage, setErrorDialogMessage] = useState('');
 
@@ -82,14 +83,38 @@ function PlanRow({ plan, onReload }: { plan: ProcurementPlan; onReload: () => vo
     }
   };
 
-  const activeVersion = plan.versions.find(v => v.is_active);
-  const canDeletePlan = !plan.versions.some(v => v.status !== PlanStatus.DRAFT);
+  const loadVersions = async () => {
+    try {
+      setVersions(await getPlanVersions(plan.id));
+    } catch (err) {
+      handleError(err, t('error_loading_plans'));
+    }
+  };
+
+  // История версий загружается только при раскрытии строки
+  const handleToggle = async () => {
+    setOpen(!open);
+    if (!open && versions === null) {
+      await loadVersions();
+    }
+  };
+
+  // Сводка плана изменилась (версия удалена или создана, сменился статус) —
+  // загруженная история устарела: перечитываем ее, если строка раскрыта
+  useEffect(() => {
+    setVersions(null);
+    if (open) {
+      loadVersions();
+    }
+  }, [plan.active_version_id, plan.versions_count, plan.status, plan.total_amount]);
+
+  const canDeletePlan = !plan.has_approved_versions;
 
   return (
     <Fragment>
       <TableRow sx={{ '& > *': { borderBottom: 'unset' } }}>
         <TableCell>
-          <IconButton aria-label="expand row" size="small" onClick={() => setOpen(!open)}>
+          <IconButton aria-label="expand row" size="small" onClick={handleToggle}>
             {open ? <KeyboardArrowUpIcon /> : <KeyboardArrowDownIcon />}
           </IconButton>
         </TableCell>
@@ -101,14 +126,14 @@ function PlanRow({ plan, onReload }: { plan: ProcurementPlan; onReload: () => vo
         </TableCell>
         <TableCell>
           <Chip
-            label={t(`status_${activeVersion?.status}`)}
-            color={getStatusChipColor(activeVersion?.status || PlanStatus.DRAFT)}
+            label={t(`status_${plan.status}`)}
+            color={getStatusChipColor(plan.status || PlanStatus.DRAFT)}
             size="small"
           />
         </TableCell>
-        <TableCell>{formatCurrency(activeVersion?.total_amount || 0)}</TableCell>
+        <TableCell>{formatCurrency(plan.total_amount || 0)}</TableCell>
         <TableCell align="right">
-          {activeVersion?.status === PlanStatus.DRAFT ? (
+          {plan.status === PlanStatus.DRAFT ? (
             <Tooltip title={t('edit_draft')}>
               <IconButton size="small" onClick={() => navigate(`/plans/${plan.id}`)}>
                 <EditIcon />
@@ -122,7 +147,7 @@ function PlanRow({ plan, onReload }: { plan: ProcurementPlan; onReload: () => vo
             </Tooltip>
           )}
           
-          {activeVersion?.status !== PlanStatus.DRAFT && (
+          {plan.status !== PlanStatus.DRAFT && (
             <Tooltip title={t('create_new_version_tooltip')}>
               <IconButton size="small" color="primary" onClick={handleCreateNewVersion}>
                 <FileCopyIcon />
@@ -130,7 +155,7 @@ function PlanRow({ plan, onReload }: { plan: ProcurementPlan; onReload: () => vo
             </Tooltip>
           )}
 
-          {activeVersion?.status === PlanStatus.DRAFT && activeVersion.version_number > 1 && (
+          {plan.status === PlanStatus.DRAFT && (plan.active_version_number || 0) > 1 && (
             <Tooltip title={t('delete_draft_version_tooltip')}>
               <IconButton size="small" color="secondary" onClick={handleDeleteLatest}>
                 <RestoreFromTrashIcon />
@@ -163,7 +188,12 @@ function PlanRow({ plan, onReload }: { plan: ProcurementPlan; onReload: () => vo
                   </TableRow>
                 </TableHead>
                 <TableBody>
-                  {plan.versions.map((version) => (
+                  {versions === null && (
+                    <TableRow>
+                      <TableCell colSpan={6} align="center"><CircularProgress size={20} /></TableCell>
+                    </TableRow>
+                  )}
+                  {versions?.map((version) => (
                     <TableRow key={version.id}>
                       <TableCell>
                         <Typography variant="body2" fontWeight={version.is_active ? "bold" : "normal"}>
@@ -204,7 +234,9 @@ function PlanRow({ plan, onReload }: { plan: ProcurementPlan; onReload: () => vo
 export default function Dashboard() {
   const { t } = useTranslation();
   const navigate = useNavigate();
-  const [plans, setPlans] = useState<ProcurementPlan[]>([]);
+  const [plans, setPlans] = useState<ProcurementPlanSummary[]>([]);
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [isCreateDialogOpen, setCreateDialogOpen] = useState(false);
@@ -215,8 +247,9 @@ export default function Dashboard() {
     try {
       setLoading(true);
       setError('');
-      const data = await getPlans();
-      setPlans(data.sort((a, b) => b.id - a.id));
+      const page = await getPlans();
+      setPlans(page.items);
+      setNextCursor(page.next_cursor);
     } catch (err) {
       setError(t('error_loading_plans'));
       console.error(err);
@@ -225,6 +258,21 @@ export default function Dashboard() {
     }
   };
 
+  const loadMorePlans = async () => {
+    if (nextCursor === null) return;
+    try {
+      setLoadingMore(true);
+      const page = await getPlans({ cursor: nextCursor });
+      setPlans(prev => [...prev, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } catch (err) {
+      setError(t('error_loading_plans'));
+      console.error(err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     loadPlans();
   }, [t]);
@@ -287,6 +335,13 @@ export default function Dashboard() {
                 )}
               </TableBody>
             </Table>
+            {nextCursor !== null && (
+              <Box sx={{ display: 'flex', justifyContent: 'center', p: 2 }}>
+                <Button onClick={loadMorePlans} disabled={loadingMore}>
+                  {loadingMore ? <CircularProgress size={20} /> : t('load_more')}
+                </Button>
+              </Box>
+            )}
           </TableContainer>
         )}
       </Box>
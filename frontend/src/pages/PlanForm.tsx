@@ -80,7 +80,7 @@ export default function PlanForm() {
     try {
       setLoading(true);
       const data = await getPlanById(Number(planId));
-      const activeVer = data.versions.find(v => v.is_active);
+      const activeVer = data.active_version;
       setPlan(data);
       setActiveVersion(activeVer || null);
     } catch (err) {
@@ -1,7 +1,9 @@
 import axios from 'axios';
 import type { 
     Mkei, Kato, Agsk, CostItem, SourceFunding, Enstru, UserLookup,
-    NeedType, PlanItemVersion, ProcurementPlanVersion, ProcurementPlan, PlanItemPayload 
+    NeedType, PlanItemVersion, ProcurementPlanVersion, ProcurementPlan, PlanItemPayload,
+    ProcurementPlanSummary, ProcurementPlanSummaryPage, PlanItemImportResult, PlanVersionDiff,
+    SpendingDimension, SpendingReport
 } from './api.types';
 import { PlanStatus } from './api.types';
 
@@ -45,20 +47,42 @@ export const getCostItems = (q?: string): Promise<CostItem[]> => api.get('/looku
 export const getSourceFunding = (q?: string): Promise<SourceFunding[]> => api.get('/lookups/source-funding', { params: { q } }).then(res => res.data);
 export const getEnstru = (q?: string): Promise<Enstru[]> => api.get('/lookups/enstru', { params: { q } }).then(res => res.data);
 export const checkKtp = (enstruCode: string): Promise<{ is_ktp: boolean }> => api.get(`/lookups/check-ktp/${enstruCode}`).then(res => res.data);
+export const checkKtpBatch = (codes: string[]): Promise<Record<string, boolean>> =>
+  api.post('/lookups/check-ktp', { codes }).then(res => res.data.results);
+export const checkVersionKtp = (planId: number, versionId: number): Promise<{ item_id: number; item_number: number; trucode: string; is_ktp: boolean; in_registry: boolean }[]> =>
+  api.get(`/plans/${planId}/versions/${versionId}/ktp-check`).then(res => res.data);
 
 
 // --- API для Планов (ProcurementPlan) ---
-export const getPlans = (): Promise<ProcurementPlan[]> => api.get('/plans/').then(res => res.data);
+export const getPlans = (params?: { cursor?: number; year?: number; status?: PlanStatus; limit?: number }): Promise<ProcurementPlanSummaryPage> =>
+  api.get('/plans/', { params }).then(res => res.data);
 export const getPlanById = (planId: number): Promise<ProcurementPlan> => api.get(`/plans/${planId}`).then(res => res.data);
 export const createPlan = (data: { plan_name: string; year: number }): Promise<ProcurementPlan> => api.post('/plans/', data).then(res => res.data);
 export const deletePlan = (planId: number): Promise<void> => api.delete(`/plans/${planId}`);
 
 // --- API для Версий Плана (ProcurementPlanVersion) ---
+export const getPlanVersions = (planId: number): Promise<ProcurementPlanVersion[]> => api.get(`/plans/${planId}/versions`).then(res => res.data);
 export const createVersion = (planId: number): Promise<ProcurementPlanVersion> => api.post(`/plans/${planId}/versions`).then(res => res.data);
 export const updateVersionStatus = (planId: number, status: PlanStatus): Promise<ProcurementPlanVersion> =>
   api.patch(`/plans/${planId}/versions/active/status`, { status }).then(res => res.data);
 export const deleteLatestVersion = (planId: number): Promise<{ message: string }> => api.delete(`/plans/${planId}/versions/latest`).then(res => res.data);
 
+export const getVersionDiff = (planId: number, fromVersionId: number, toVersionId: number): Promise<PlanVersionDiff> =>
+  api.get(`/plans/${planId}/versions/${fromVersionId}/diff/${toVersionId}`).then(res => res.data);
+
+export const getSpendingTotals = (
+  groupBy: SpendingDimension[],
+  filters: { scope?: 'approved' | 'active'; year?: number; plan_id?: number; org_bin?: string } = {}
+): Promise<SpendingReport> => {
+  // group_by передается повторяющимся параметром (?group_by=a&group_by=b), как ждет FastAPI
+  const params = new URLSearchParams();
+  groupBy.forEach(dimension => params.append('group_by', dimension));
+  Object.entries(filters).forEach(([key, value]) => {
+    if (value !== undefined) params.append(key, String(value));
+  });
+  return api.get('/analytics/spending', { params }).then(res => res.data);
+};
+
 export const exportVersionToExcel = async (planId: number, versionId: number): Promise<void> => {
   const response = await api.get(`/plans/${planId}/versions/${versionId}/export-excel`, {
     responseType: 'blob',
@@ -77,10 +101,17 @@ export const getItemById = (itemId: number): Promise<PlanItemVersion> => api.get
 export const addItemToPlan = (planId: number, itemData: PlanItemPayload): Promise<PlanItemVersion> => api.post(`/plans/${planId}/items`, itemData).then(res => res.data);
 export const updateItem = (itemId: number, itemData: Partial<PlanItemPayload>): Promise<PlanItemVersion> => api.put(`/items/${itemId}`, itemData).then(res => res.data);
 export const deleteItem = (itemId: number): Promise<void> => api.delete(`/items/${itemId}`);
+export const importItemsFromExcel = (planId: number, file: File): Promise<PlanItemImportResult> => {
+  const formData = new FormData();
+  formData.append('file', file);
+  return api.post(`/plans/${planId}/items:import`, formData).then(res => res.data);
+};
 
 export default api;
 export { PlanStatus };
 export type { 
     Mkei, Kato, Agsk, CostItem, SourceFunding, Enstru, UserLookup,
-    NeedType, PlanItemVersion, ProcurementPlanVersion, ProcurementPlan, PlanItemPayload 
+    NeedType, PlanItemVersion, ProcurementPlanVersion, ProcurementPlan, PlanItemPayload,
+    ProcurementPlanSummary, ProcurementPlanSummaryPage, PlanItemImportResult, PlanVersionDiff,
+    SpendingDimension, SpendingReport
 };
@@ -59,6 +59,94 @@ export interface ProcurementPlan {
   created_by: number;
   created_at: string;
   versions: ProcurementPlanVersion[];
+  active_version?: ProcurementPlanVersion | null; // Только в GET /plans/{id}, вместе с позициями
+}
+
+// Строка списка планов (GET /plans/)
+export interface ProcurementPlanSummary {
+  id: number;
+  plan_name: string;
+  year: number;
+  created_by: number;
+  created_at: string;
+  active_version_id: number | null;
+  active_version_number: number | null;
+  status: PlanStatus | null;
+  total_amount: number | null;
+  ktp_percentage: number | null;
+  versions_count: number;
+  has_approved_versions: boolean;
+}
+
+export interface ProcurementPlanSummaryPage {
+  items: ProcurementPlanSummary[];
+  next_cursor: number | null;
+}
+
+export interface PlanItemImportResult {
+  rows: number;
+  created: number;
+  first_item_number: number | null;
+  last_item_number: number | null;
+  errors: { row: number; field: string | null; value: unknown; message: string }[];
+  version: ProcurementPlanVersion;
+}
+
+export interface PlanItemSnapshot {
+  item_number: number;
+  trucode: string;
+  need_type: NeedType;
+  unit_id: number | null;
+  expense_item_id: number;
+  funding_source_id: number;
+  agsk_id: string | null;
+  kato_purchase_id: number | null;
+  kato_delivery_id: number | null;
+  quantity: string;
+  price_per_unit: string;
+  total_amount: string;
+  is_ktp: boolean;
+  is_resident: boolean;
+}
+
+export type SpendingDimension =
+  | 'expense_item_id' | 'funding_source_id' | 'need_type' | 'kato_delivery_id' | 'is_ktp'
+  | 'plan_id' | 'year' | 'org_bin';
+
+export interface SpendingRow {
+  expense_item_id?: number | null;
+  funding_source_id?: number | null;
+  need_type?: NeedType | null;
+  kato_delivery_id?: number | null;
+  is_ktp?: boolean | null;
+  plan_id?: number | null;
+  year?: number | null;
+  org_bin?: string | null;
+  total_amount: string;
+  item_count: number;
+}
+
+export interface SpendingReport {
+  scope: 'approved' | 'active';
+  group_by: SpendingDimension[];
+  total_amount: string;
+  item_count: number;
+  rows: SpendingRow[];
+}
+
+export interface PlanVersionDiff {
+  from_version: ProcurementPlanVersion;
+  to_version: ProcurementPlanVersion;
+  totals: {
+    total_amount_delta: string;
+    ktp_amount_delta: string;
+    ktp_percentage_delta: string;
+    import_percentage_delta: string;
+  };
+  added: PlanItemSnapshot[];
+  removed: PlanItemSnapshot[];
+  changed: { item_number: number; changes: Record<string, { old: unknown; new: unknown }>; total_amount_delta: string }[];
+  unchanged_count: number;
 }
 
 export interface PlanItemPayload {